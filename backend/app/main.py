@@ -1,10 +1,25 @@
+import asyncio
+import os
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
 from app.config import settings
-from app.routers import hybrid_search, auth
+from app.routers import hybrid_search, auth, admin
 from app.services.auth import AuthService
+from app.services.db_utils import close_db_pool
+from app.services.warmup import warm_up, warmup_state
+from app.services.health import health_monitor, UNHEALTHY
+
+
+async def run_warmup():
+    """Warm this worker up, retrying until the database is reachable"""
+    delay = 1.0
+    while not await run_in_threadpool(warm_up):
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30.0)
+    print(f"Worker {os.getpid()} warmed up and ready")
 
 
 @asynccontextmanager
@@ -12,9 +27,15 @@ async def lifespan(app: FastAPI):
     """Lifespan events for the application"""
     # Startup - database tables should already exist from init scripts
     print("Starting up Hybrid Search Backend API...")
+    # Warm up in the background so /health answers while /ready waits
+    warmup_task = asyncio.create_task(run_warmup())
+    health_task = asyncio.create_task(health_monitor.run())
     yield
     # Shutdown
     print("Shutting down Hybrid Search Backend API...")
+    warmup_task.cancel()
+    health_task.cancel()
+    close_db_pool()
 
 
 def create_app() -> FastAPI:
@@ -40,7 +61,7 @@ def create_app() -> FastAPI:
     @app.middleware("http")
     async def auth_middleware(request: Request, call_next):
         # Public endpoints that don't require authentication
-        public_paths = ["/", "/health", "/docs", "/openapi.json", "/api/v1/auth/login", "/api/v1/auth/logout", "/api/v1/auth/verify"]
+        public_paths = ["/", "/health", "/ready", "/docs", "/openapi.json", "/api/v1/auth/login", "/api/v1/auth/logout", "/api/v1/auth/verify"]
         
         if request.url.path in public_paths or request.url.path.startswith("/docs"):
             return await call_next(request)
@@ -61,11 +82,21 @@ def create_app() -> FastAPI:
                 content={"detail": "Invalid or expired token"}
             )
         
+        # Reject database-backed work early while dependencies are unhealthy
+        shed_reason = health_monitor.shed_reason()
+        if shed_reason:
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": f"Service overloaded: {shed_reason}"},
+                headers={"Retry-After": str(int(settings.health_probe_interval_seconds))}
+            )
+        
         return await call_next(request)
     
     # Include routers with /api/v1 prefix
     app.include_router(auth.router, prefix="/api/v1")
     app.include_router(hybrid_search.router, prefix="/api/v1")
+    app.include_router(admin.router, prefix="/api/v1")
     
     @app.get("/")
     async def root():
@@ -77,10 +108,33 @@ def create_app() -> FastAPI:
     
     @app.get("/health")
     async def health_check():
+        """Cached dependency health; 503 when the instance should not receive traffic"""
+        snapshot = health_monitor.snapshot
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE if snapshot["status"] == UNHEALTHY else status.HTTP_200_OK,
+            content={
+                **snapshot,
+                "version": settings.app_version
+            }
+        )
+    
+    @app.get("/ready")
+    async def readiness_check():
+        """Report ready only once this worker has finished warming up"""
+        return JSONResponse(
+            status_code=status.HTTP_200_OK if warmup_state.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "ready" if warmup_state.ready else "warming_up",
+                "worker_pid": os.getpid(),
+                **warmup_state.to_dict()
+            }
+        )
+    
+    @app.get("/metrics")
+    async def metrics():
+        from app.services.embedding_gateway import embedding_gateway
         return {
-            "status": "healthy", 
-            "database": "postgresql",
-            "version": settings.app_version
+            "embedding_gateway": embedding_gateway.metrics()
         }
     
     return app
@@ -1,9 +1,9 @@
 """
 Database models for hybrid search application.
-Only includes the attachments table for document storage and search.
+Only includes the attachments tables for document storage and search.
 """
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text, Integer
+from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey
 from app.database.connection import Base
 from app.config import settings
 
@@ -12,15 +12,33 @@ class Attachment(Base):
     """
     Attachments table for storing uploaded documents with vector embeddings.
     Supports both keyword (PGroonga) and semantic (pgvector) search.
+    Only small, frequently read fields live here; the body is in AttachmentContent.
     """
     __tablename__ = "attachments"
     __table_args__ = {"schema": settings.db_schema}
     
     id = Column(Integer, primary_key=True, index=True)
     file_name = Column(String(500), nullable=False)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True, unique=True)
+    preview = Column(String(200), nullable=False, default="")
     # embedding is stored as vector type but we don't define it in SQLAlchemy
     # as we handle it via raw SQL due to pgvector integration
-    content_length = Column(Integer, nullable=True)  # computed column in DB
+    content_length = Column(Integer, nullable=False, default=0)
     uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, nullable=True)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+
+
+class AttachmentContent(Base):
+    """
+    Document bodies, stored LZ4-compressed apart from the attachments table.
+    Carries the PGroonga full-text index.
+    """
+    __tablename__ = "attachment_contents"
+    __table_args__ = {"schema": settings.db_schema}
+    
+    attachment_id = Column(
+        Integer,
+        ForeignKey(f"{settings.db_schema}.attachments.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    content = Column(Text, nullable=False)
@@ -0,0 +1,49 @@
+"""
+Admin router for query diagnostics
+Exposes the slow-query log and per-statement timings of the whole deployment
+"""
+from fastapi import APIRouter, Query
+from starlette.concurrency import run_in_threadpool
+from app.services.db_utils import query_profiler
+
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _slow_query_report(limit: int, include_plans: bool) -> dict:
+    # Publish this worker's pending timings first so the answering worker is not behind
+    query_profiler.flush()
+    statements = query_profiler.statement_stats()
+    return {
+        "profiling_enabled": query_profiler.enabled,
+        "threshold_ms": query_profiler.threshold_ms,
+        "sample_rate": query_profiler.sample_rate,
+        "skipped_captures": sum(statement["skipped_captures"] for statement in statements),
+        "captures": query_profiler.recent_captures(limit, include_plans),
+        "statements": statements
+    }
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500, description="Maximum number of captured plans"),
+    include_plans: bool = Query(False, description="Include the full EXPLAIN JSON of each capture")
+):
+    """
+    Captured EXPLAIN (ANALYZE, BUFFERS) plans, newest first, plus statement timings.
+
+    Captures and timings from every worker are stored in the database, so any worker
+    answers for the whole deployment; other workers' timings lag by up to
+    SLOW_QUERY_FLUSH_SECONDS. Captures are tagged with the search mode, corpus size
+    and worker pid; the ``scans`` summary of each capture shows which indexes
+    (e.g. HNSW, PGroonga) the plan used. Profiling is configured through
+    QUERY_PROFILING_ENABLED and the SLOW_QUERY_* settings.
+    """
+    return await run_in_threadpool(_slow_query_report, limit, include_plans)
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    """Clear captured plans and statement timings for every worker"""
+    await run_in_threadpool(query_profiler.reset)
+    return {"message": "Slow-query log cleared"}
@@ -3,15 +3,24 @@ Hybrid Search Router
 Provides endpoints for file upload and hybrid search functionality
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Header, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Iterator, List, Optional, Tuple
+from operator import itemgetter
 import json
 import logging
 import os
+from urllib.parse import quote
+import psycopg2
 
 # Import only what we need at module level
-from app.services.db_utils import execute_query, execute_insert
+from app.services.db_utils import execute_query, query_tags
+from app.services.dedup import (
+    compute_content_hash, find_by_content_hash, find_by_content_hashes, resolve_duplicate
+)
+from app.services.suggest import add_document_terms, remove_document_terms, suggest
+from app.schemas.schemas import SearchResult, SearchResponse, AttachmentListResponse
 from app.config import settings
 
 # Configure logging
@@ -20,12 +29,151 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/hybrid-search", tags=["hybrid-search"])
 
+# Characters of content kept on the slim attachments row for result snippets
+PREVIEW_LENGTH = 200
+# Bytes of an attachment body fetched from the database per streamed chunk
+CONTENT_CHUNK_SIZE = 1024 * 1024
+# Result snippet computed in SQL from the stored preview
+SNIPPET_SQL = f"CASE WHEN a.content_length > {PREVIEW_LENGTH} THEN a.preview || '...' ELSE a.preview END"
+
+KEYWORD_SEARCH_SQL = f"""
+    WITH keyword AS (
+        SELECT attachment_id, pgroonga_score(tableoid, ctid) AS keyword_score
+        FROM {settings.db_schema}.attachment_contents
+        WHERE content &@~ %s
+    )
+    SELECT a.id::text AS id, a.file_name, {SNIPPET_SQL} AS snippet, a.content_length,
+        k.keyword_score::float8 AS keyword_score,
+        0.0::float8 AS semantic_score,
+        k.keyword_score::float8 AS hybrid_score
+    FROM keyword k
+    JOIN {settings.db_schema}.attachments a ON a.id = k.attachment_id
+    ORDER BY keyword_score DESC
+    LIMIT 10;
+"""
+
+SEARCH_RESULT_FIELDS = tuple(SearchResult.model_fields)
+_RESULT_FIELD_BUILDERS = {
+    "id": itemgetter("id"),
+    "title": itemgetter("file_name"),
+    "snippet": itemgetter("snippet"),
+    "scores": lambda row: {
+        "keyword": row["keyword_score"],
+        "semantic": row["semantic_score"],
+        "hybrid": row["hybrid_score"]
+    },
+    "metadata": lambda row: {
+        "filename": row["file_name"],
+        "content_length": row["content_length"]
+    },
+}
+
+
+async def _read_text_content(file: UploadFile) -> str:
+    """
+    Read an uploaded file and decode it as text.
+    
+    Args:
+        file: The uploaded file (should be text-based)
+        
+    Returns:
+        Decoded, non-empty text content
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+    
+    content_bytes = await file.read()
+    
+    try:
+        # Try to decode as UTF-8
+        content = content_bytes.decode("utf-8")
+    except UnicodeDecodeError:
+        try:
+            # Fallback to latin-1
+            content = content_bytes.decode("latin-1")
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"{file.filename}: file content is not readable as text"
+            )
+    
+    if not content.strip():
+        raise HTTPException(status_code=400, detail=f"{file.filename}: file content is empty")
+    
+    return content
+
+
+def _insert_attachment(
+    file_name: str,
+    content: str,
+    content_hash: str,
+    embedding: List[float],
+    embedded_with: Tuple[str, int],
+) -> Optional[int]:
+    """
+    Insert a new attachment and its body, returning None if the content hash already exists.
+    
+    The slim attachments row carries the preview and length used by search and
+    listing; the full body goes to attachment_contents in the same statement.
+    
+    Raises:
+        EmbeddingModelChangedError: The re-embedding job swapped in a different
+            model than ``embedded_with`` (model, dimension)
+    """
+    # The swap holds an ACCESS EXCLUSIVE lock on attachments, so once this
+    # statement runs it sees the model the embedding column now holds
+    query = f"""
+        WITH stale AS (
+            SELECT 1
+            FROM (
+                SELECT model, dimension
+                FROM {settings.db_schema}.reembed_checkpoints
+                WHERE status = 'swapped'
+                ORDER BY updated_at DESC
+                LIMIT 1
+            ) active
+            WHERE (active.model, active.dimension) IS DISTINCT FROM (%s, %s)
+        ), new_attachment AS (
+            INSERT INTO {settings.db_schema}.attachments
+                (file_name, content_hash, preview, content_length, embedding)
+            SELECT %s, %s, %s, %s, %s::vector
+            WHERE NOT EXISTS (SELECT 1 FROM stale)
+            ON CONFLICT (content_hash) DO NOTHING
+            RETURNING id
+        ), new_content AS (
+            INSERT INTO {settings.db_schema}.attachment_contents (attachment_id, content)
+            SELECT id, %s FROM new_attachment
+        )
+        SELECT (SELECT id FROM new_attachment) AS id, EXISTS (SELECT 1 FROM stale) AS stale_model
+    """
+    from app.services.embedding_gateway import EmbeddingModelChangedError
+    
+    model, dimension = embedded_with
+    row = execute_query(query, (
+        model, dimension,
+        file_name, content_hash, content[:PREVIEW_LENGTH], len(content), json.dumps(embedding), content
+    ), fetch_all=False)
+    if row["stale_model"]:
+        raise EmbeddingModelChangedError(f"Embedded with {model}, which is no longer the active model")
+    return row["id"]
+
+
+def _index_terms(content: str) -> None:
+    """Add a stored document's terms to the suggestion table (best effort)"""
+    try:
+        add_document_terms(content)
+    except Exception as e:
+        logger.warning(f"Failed to index suggestion terms: {e}")
+
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Upload a file and generate embeddings for hybrid search.
     
+    Content that is already stored is not embedded again; the existing row is
+    returned according to the configured dedup policy.
+    
     Args:
         file: The uploaded file (should be text-based)
         
@@ -33,33 +181,33 @@ async def upload_file(file: UploadFile = File(...)):
         JSON response with upload status and file ID
     """
     try:
-        # Validate file type
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No filename provided")
+        content = await _read_text_content(file)
+        content_hash = compute_content_hash(content)
         
-        # Read file content
-        content_bytes = await file.read()
-        
-        try:
-            # Try to decode as UTF-8
-            content = content_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            try:
-                # Fallback to latin-1
-                content = content_bytes.decode("latin-1")
-            except UnicodeDecodeError:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="File content is not readable as text"
-                )
-        
-        if not content.strip():
-            raise HTTPException(status_code=400, detail="File content is empty")
+        # Skip embedding and insert entirely for known content
+        existing = find_by_content_hash(content_hash)
+        if existing:
+            result = resolve_duplicate(existing, file.filename)
+            return JSONResponse(
+                content={
+                    "message": f"{file.filename} matches existing file {existing['file_name']}",
+                    **result
+                },
+                status_code=200
+            )
         
         # Generate embedding
+        from app.services.embedding_gateway import (
+            embedding_gateway, EmbeddingModelChangedError, EmbeddingUnavailableError
+        )
         try:
-            from app.services.embeddings import embed_text
-            embedding = embed_text(content)
+            embeddings, embedded_with = await embedding_gateway.embed_documents([content])
+        except EmbeddingUnavailableError as e:
+            logger.warning(f"Embedding provider unavailable for upload: {e}")
+            raise HTTPException(
+                status_code=503, 
+                detail=f"Embedding service unavailable, try again later: {str(e)}"
+            )
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
             raise HTTPException(
@@ -69,26 +217,44 @@ async def upload_file(file: UploadFile = File(...)):
         
         # Insert into database
         try:
-            query = f"""
-                INSERT INTO {settings.db_schema}.attachments (file_name, content, embedding)
-                VALUES (%s, %s, %s::vector)
-                RETURNING id
-            """
-            file_id = execute_insert(query, (file.filename, content, json.dumps(embedding)))
+            file_id = _insert_attachment(file.filename, content, content_hash, embeddings[0], embedded_with)
             
             if not file_id:
-                raise HTTPException(status_code=500, detail="Failed to save file to database")
+                # A concurrent upload stored the same content first
+                existing = find_by_content_hash(content_hash)
+                if not existing:
+                    raise HTTPException(status_code=500, detail="Failed to save file to database")
+                result = resolve_duplicate(existing, file.filename)
+                return JSONResponse(
+                    content={
+                        "message": f"{file.filename} matches existing file {existing['file_name']}",
+                        **result
+                    },
+                    status_code=200
+                )
             
+            background_tasks.add_task(_index_terms, content)
             return JSONResponse(
                 content={
                     "message": f"{file.filename} uploaded and embedded successfully",
                     "file_id": file_id,
                     "filename": file.filename,
-                    "content_length": len(content)
+                    "content_length": len(content),
+                    "deduplicated": False
                 },
                 status_code=201
             )
             
+        except HTTPException:
+            raise
+        except (EmbeddingModelChangedError, psycopg2.DataError) as e:
+            # The re-embedding job swapped in a new model after the content was embedded
+            logger.warning(f"Embedding rejected by the database, refreshing the model: {e}")
+            embedding_gateway.expire_model()
+            raise HTTPException(
+                status_code=503, 
+                detail="Embedding model changed during upload, try again"
+            )
         except Exception as e:
             logger.error(f"Database insertion failed: {e}")
             raise HTTPException(
@@ -103,10 +269,199 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@router.get("/search")
+def _embedding_batches(items: List[Tuple[str, Tuple[int, str]]]) -> Iterator[List[Tuple[str, Tuple[int, str]]]]:
+    """Split pending (content_hash, (index, content)) items into bounded embedding requests"""
+    batch: List[Tuple[str, Tuple[int, str]]] = []
+    chars = 0
+    for item in items:
+        size = len(item[1][1])
+        if batch and (
+            len(batch) >= settings.upload_embedding_batch_size
+            or chars + size > settings.upload_embedding_batch_chars
+        ):
+            yield batch
+            batch, chars = [], 0
+        batch.append(item)
+        chars += size
+    if batch:
+        yield batch
+
+
+def _resolve_stored_duplicate(content_hash: str, file_name: str) -> dict:
+    """Resolve a file against the stored row for its content, which may have been deleted meanwhile"""
+    existing = find_by_content_hash(content_hash)
+    if not existing:
+        return {
+            "file_id": None,
+            "filename": file_name,
+            "deduplicated": False,
+            "error": "Matching file was deleted during the upload, try again"
+        }
+    return resolve_duplicate(existing, file_name)
+
+
+@router.post("/upload/bulk")
+async def upload_files(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)):
+    """
+    Upload several files at once, embedding only content not already stored.
+    
+    Duplicates within the batch and against existing attachments are resolved
+    with the configured dedup policy; the remaining files are embedded in
+    batched requests bounded by UPLOAD_EMBEDDING_BATCH_SIZE files and
+    UPLOAD_EMBEDDING_BATCH_CHARS characters.
+    
+    Args:
+        files: The uploaded files (should be text-based)
+        
+    Returns:
+        JSON response with a per-file upload status
+    """
+    try:
+        results: List[Optional[dict]] = [None] * len(files)
+        # content_hash -> (index of first file, content) for each distinct content
+        unique: dict = {}
+        batch_duplicates = []
+        
+        for index, file in enumerate(files):
+            content = await _read_text_content(file)
+            content_hash = compute_content_hash(content)
+            if content_hash in unique:
+                batch_duplicates.append((index, content_hash))
+            else:
+                unique[content_hash] = (index, content)
+        
+        # One round trip for the whole batch, off the event loop
+        existing_rows = await run_in_threadpool(find_by_content_hashes, list(unique))
+        pending: dict = {}
+        for content_hash, (index, content) in unique.items():
+            existing = existing_rows.get(content_hash)
+            if existing:
+                results[index] = await run_in_threadpool(resolve_duplicate, existing, files[index].filename)
+            else:
+                pending[content_hash] = (index, content)
+        
+        from app.services.embedding_gateway import (
+            embedding_gateway, EmbeddingModelChangedError, EmbeddingUnavailableError
+        )
+        for batch in _embedding_batches(list(pending.items())):
+            # Each request gets its own gateway deadline; stored batches survive a later failure
+            try:
+                embeddings, embedded_with = await embedding_gateway.embed_documents(
+                    [content for _, (_, content) in batch]
+                )
+            except EmbeddingUnavailableError as e:
+                logger.warning(f"Embedding provider unavailable for bulk upload: {e}")
+                raise HTTPException(
+                    status_code=503, 
+                    detail=f"Embedding service unavailable, try again later: {str(e)}"
+                )
+            except Exception as e:
+                logger.error(f"Batch embedding generation failed: {e}")
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Failed to generate embeddings: {str(e)}"
+                )
+            
+            def store_batch() -> None:
+                for (content_hash, (index, content)), embedding in zip(batch, embeddings):
+                    file_name = files[index].filename
+                    file_id = _insert_attachment(file_name, content, content_hash, embedding, embedded_with)
+                    if file_id:
+                        background_tasks.add_task(_index_terms, content)
+                        results[index] = {
+                            "file_id": file_id,
+                            "filename": file_name,
+                            "content_length": len(content),
+                            "deduplicated": False
+                        }
+                    else:
+                        # A concurrent upload stored the same content first
+                        results[index] = _resolve_stored_duplicate(content_hash, file_name)
+            
+            try:
+                await run_in_threadpool(store_batch)
+            except (EmbeddingModelChangedError, psycopg2.DataError) as e:
+                # The re-embedding job swapped in a new model after the content was embedded
+                logger.warning(f"Embeddings rejected by the database, refreshing the model: {e}")
+                embedding_gateway.expire_model()
+                raise HTTPException(
+                    status_code=503, 
+                    detail="Embedding model changed during upload, try again"
+                )
+            except Exception as e:
+                logger.error(f"Database insertion failed: {e}")
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Failed to save to database: {str(e)}"
+                )
+        
+        # Files repeated within the batch resolve against the row just stored
+        for index, content_hash in batch_duplicates:
+            results[index] = await run_in_threadpool(
+                _resolve_stored_duplicate, content_hash, files[index].filename
+            )
+        
+        created = sum(1 for result in results if result["file_id"] and not result["deduplicated"])
+        deduplicated = sum(1 for result in results if result["deduplicated"])
+        return JSONResponse(
+            content={
+                "message": f"{len(files)} files processed, {created} new",
+                "results": results,
+                "created": created,
+                "deduplicated": deduplicated,
+                "failed": len(files) - created - deduplicated
+            },
+            status_code=201 if created else 200
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in bulk upload: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def format_search_results(rows: List[dict], fields: Tuple[str, ...] = SEARCH_RESULT_FIELDS) -> List[dict]:
+    """
+    Shape search rows into SearchResult records in a single pass.
+    
+    The SQL already returns final types (text id, snippet, float8 scores), so
+    each field is a plain lookup; fields not requested are never built.
+    
+    Args:
+        rows: Rows from the search query
+        fields: SearchResult fields to include
+        
+    Returns:
+        List of result dicts; fields not requested are left unset on SearchResult
+    """
+    builders = [(field, _RESULT_FIELD_BUILDERS[field]) for field in fields]
+    return [{field: build(row) for field, build in builders} for row in rows]
+
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Validate a comma-separated ``fields`` parameter against SearchResult fields"""
+    if not fields:
+        return SEARCH_RESULT_FIELDS
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in _RESULT_FIELD_BUILDERS]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown result fields: {', '.join(unknown) or fields}. "
+                   f"Choose from {', '.join(SEARCH_RESULT_FIELDS)}"
+        )
+    return requested
+
+
+@router.get("/search", response_model=SearchResponse, response_model_exclude_unset=True)
 async def search(
     q: str = Query(..., description="Search query"),
-    mode: str = Query("hybrid", regex="^(keyword|semantic|hybrid)$", description="Search mode")
+    mode: str = Query("hybrid", pattern="^(keyword|semantic|hybrid)$", description="Search mode"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated result fields to return (id,title,snippet,scores,metadata); default all"
+    )
 ):
     """
     Perform hybrid search across uploaded documents.
@@ -114,6 +469,7 @@ async def search(
     Args:
         q: Search query string
         mode: Search mode - 'keyword', 'semantic', or 'hybrid'
+        fields: Optional subset of result fields to return
         
     Returns:
         JSON response with search results
@@ -122,12 +478,19 @@ async def search(
         if not q.strip():
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
+        result_fields = _parse_fields(fields)
+        
         # Generate embedding for semantic/hybrid search
         embedding = None
+        search_mode = mode
         if mode in ["semantic", "hybrid"]:
+            from app.services.embedding_gateway import embedding_gateway, EmbeddingUnavailableError
             try:
-                from app.services.embeddings import embed_text
-                embedding = embed_text(q)
+                embedding = await embedding_gateway.embed_text(q)
+            except EmbeddingUnavailableError as e:
+                # Degrade to keyword-only results instead of failing the search
+                logger.warning(f"Embedding provider unavailable, falling back to keyword search: {e}")
+                search_mode = "keyword"
             except Exception as e:
                 logger.error(f"Embedding generation failed for query: {e}")
                 raise HTTPException(
@@ -137,79 +500,71 @@ async def search(
         
         # Execute search based on mode
         try:
-            if mode == "keyword":
-                query = f"""
-                    SELECT id, file_name, content,
-                        pgroonga_score(tableoid, ctid) AS keyword_score,
-                        0.0 AS semantic_score,
-                        pgroonga_score(tableoid, ctid) AS hybrid_score
-                    FROM {settings.db_schema}.attachments
-                    WHERE content &@~ %s
-                    ORDER BY keyword_score DESC
-                    LIMIT 10;
-                """
-                results = execute_query(query, (q,))
+            if search_mode == "keyword":
+                query, params = KEYWORD_SEARCH_SQL, (q,)
 
-            elif mode == "semantic":
+            elif search_mode == "semantic":
                 query = f"""
-                    SELECT id, file_name, content,
-                        0.0 AS keyword_score,
-                        1 - (embedding <=> %s::vector) AS semantic_score,
-                        1 - (embedding <=> %s::vector) AS hybrid_score
-                    FROM {settings.db_schema}.attachments
-                    WHERE embedding IS NOT NULL
+                    SELECT a.id::text AS id, a.file_name, {SNIPPET_SQL} AS snippet, a.content_length,
+                        0.0::float8 AS keyword_score,
+                        (1 - (a.embedding <=> %s::vector))::float8 AS semantic_score,
+                        (1 - (a.embedding <=> %s::vector))::float8 AS hybrid_score
+                    FROM {settings.db_schema}.attachments a
+                    WHERE a.embedding IS NOT NULL
                     ORDER BY semantic_score DESC
                     LIMIT 10;
                 """
                 embedding_json = json.dumps(embedding)
-                results = execute_query(query, (embedding_json, embedding_json))
+                params = (embedding_json, embedding_json)
 
             else:  # hybrid
                 query = f"""
-                    SELECT id, file_name, content,
-                        COALESCE(pgroonga_score(tableoid, ctid), 0.0) AS keyword_score,
-                        COALESCE(1 - (embedding <=> %s::vector), 0.0) AS semantic_score,
+                    WITH keyword AS (
+                        SELECT attachment_id, pgroonga_score(tableoid, ctid) AS keyword_score
+                        FROM {settings.db_schema}.attachment_contents
+                        WHERE content &@~ %s
+                    )
+                    SELECT a.id::text AS id, a.file_name, {SNIPPET_SQL} AS snippet, a.content_length,
+                        COALESCE(k.keyword_score, 0.0)::float8 AS keyword_score,
+                        COALESCE(1 - (a.embedding <=> %s::vector), 0.0)::float8 AS semantic_score,
                         (
-                            0.5 * COALESCE(pgroonga_score(tableoid, ctid), 0.0)
-                            + 0.5 * COALESCE(1 - (embedding <=> %s::vector), 0.0)
-                        ) AS hybrid_score
-                    FROM {settings.db_schema}.attachments
-                    WHERE content &@~ %s OR embedding IS NOT NULL
+                            0.5 * COALESCE(k.keyword_score, 0.0)
+                            + 0.5 * COALESCE(1 - (a.embedding <=> %s::vector), 0.0)
+                        )::float8 AS hybrid_score
+                    FROM {settings.db_schema}.attachments a
+                    LEFT JOIN keyword k ON k.attachment_id = a.id
+                    WHERE k.attachment_id IS NOT NULL OR a.embedding IS NOT NULL
                     ORDER BY hybrid_score DESC
                     LIMIT 10;
                 """
                 embedding_json = json.dumps(embedding)
-                results = execute_query(query, (embedding_json, embedding_json, q))
-
-            # Format results
-            formatted_results = []
-            for row in results:
-                # Create snippet (first 200 chars)
-                snippet = row['content'][:200] + "..." if len(row['content']) > 200 else row['content']
-                
-                formatted_results.append({
-                    "id": str(row['id']),
-                    "title": row['file_name'],
-                    "snippet": snippet,
-                    "scores": {
-                        "keyword": float(row['keyword_score']) if row['keyword_score'] else 0.0,
-                        "semantic": float(row['semantic_score']) if row['semantic_score'] else 0.0,
-                        "hybrid": float(row['hybrid_score']) if row['hybrid_score'] else 0.0
-                    },
-                    "metadata": {
-                        "filename": row['file_name'],
-                        "content_length": len(row['content'])
-                    }
-                })
+                params = (q, embedding_json, embedding_json)
+
+            try:
+                with query_tags(endpoint="search", mode=mode, effective_mode=search_mode):
+                    results = execute_query(query, params)
+            except psycopg2.DataError as e:
+                if search_mode == "keyword":
+                    raise
+                # The re-embedding job swapped in a new dimension after the query was embedded
+                logger.warning(f"Query embedding rejected, falling back to keyword search: {e}")
+                embedding_gateway.expire_model()
+                search_mode = "keyword"
+                with query_tags(endpoint="search", mode=mode, effective_mode=search_mode):
+                    results = execute_query(KEYWORD_SEARCH_SQL, (q,))
+
+            formatted_results = format_search_results(results, result_fields)
             
-            return JSONResponse(
-                content={
-                    "query": q,
-                    "mode": mode,
-                    "results": formatted_results,
-                    "total_results": len(formatted_results)
-                }
-            )
+            # Validated and serialized by SearchResponse; fields left out of
+            # ``fields=`` stay unset and are excluded from the response
+            return {
+                "query": q,
+                "mode": mode,
+                "effective_mode": search_mode,
+                "degraded": search_mode != mode,
+                "results": formatted_results,
+                "total_results": len(formatted_results)
+            }
             
         except Exception as e:
             logger.error(f"Search query failed: {e}")
@@ -225,47 +580,197 @@ async def search(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@router.get("/attachments")
+@router.get("/suggest")
+async def suggest_completions(
+    q: str = Query(..., max_length=200, description="Partial query typed so far"),
+    limit: int = Query(8, ge=1, le=20, description="Maximum number of suggestions")
+):
+    """
+    Type-ahead completions for a partial query.
+    
+    Matches file names against the whole query and document terms against its
+    last word using PGroonga prefix indexes; never calls the embedding provider.
+    
+    Args:
+        q: Partial query string
+        limit: Maximum number of suggestions
+        
+    Returns:
+        JSON response with suggestions
+    """
+    try:
+        with query_tags(endpoint="suggest"):
+            suggestions = suggest(q, limit)
+        return JSONResponse(
+            content={
+                "query": q,
+                "suggestions": suggestions
+            }
+        )
+    except Exception as e:
+        logger.error(f"Suggest query failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Suggest failed: {str(e)}")
+
+
+@router.get("/attachments", response_model=AttachmentListResponse)
 async def list_attachments():
     """
     List all uploaded attachments.
     
+    Names of duplicate uploads linked to an attachment by the dedup policy are
+    listed with it in ``linked_filenames``.
+    
     Returns:
         JSON response with list of attachments
     """
     try:
+        # Columns are already named and typed like AttachmentListItem
         query = f"""
-            SELECT id, file_name, uploaded_at,
-                   LENGTH(content) as content_length
-            FROM {settings.db_schema}.attachments
-            ORDER BY uploaded_at DESC
+            SELECT a.id::text AS id, a.file_name AS filename, a.uploaded_at, a.content_length,
+                ARRAY(
+                    SELECT f.file_name
+                    FROM {settings.db_schema}.attachment_file_names f
+                    WHERE f.attachment_id = a.id
+                    ORDER BY f.linked_at
+                ) AS linked_filenames
+            FROM {settings.db_schema}.attachments a
+            ORDER BY a.uploaded_at DESC
             LIMIT 100;
         """
-        results = execute_query(query)
-        
-        formatted_results = []
-        for row in results:
-            formatted_results.append({
-                "id": str(row['id']),
-                "filename": row['file_name'],
-                "uploaded_at": row['uploaded_at'].isoformat() if row['uploaded_at'] else None,
-                "content_length": row['content_length']
-            })
+        with query_tags(endpoint="list_attachments"):
+            formatted_results = execute_query(query)
         
-        return JSONResponse(
-            content={
-                "attachments": formatted_results,
-                "total": len(formatted_results)
-            }
-        )
+        return {
+            "attachments": formatted_results,
+            "total": len(formatted_results)
+        }
         
     except Exception as e:
         logger.error(f"Failed to list attachments: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list attachments: {str(e)}")
 
 
+def _content_disposition(file_name: str) -> str:
+    """
+    Build an inline Content-Disposition header safe for any file name (RFC 6266).
+    
+    Headers are encoded as latin-1, so the plain filename gets an ASCII fallback
+    and the real name goes in the UTF-8 percent-encoded filename* parameter.
+    """
+    fallback = "".join(ch if " " <= ch <= "~" and ch not in '"\\' else "_" for ch in file_name)
+    return f'inline; filename="{fallback}"; filename*=UTF-8\'\'{quote(file_name, safe="")}'
+
+
+def _parse_range(range_header: str, total: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range: bytes=`` header into inclusive byte offsets.
+    
+    Returns None when the header should be ignored (multiple ranges or another
+    unit) and raises HTTPException 416 when the range cannot be satisfied.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError
+            start, end = max(total - length, 0), total - 1
+        else:
+            start = int(start_text)
+            end = int(end_text) if end_text else total - 1
+    except ValueError:
+        return None
+    
+    if start >= total or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{total}"}
+        )
+    return start, min(end, total - 1)
+
+
+@router.get("/attachments/{attachment_id}/content")
+async def get_attachment_content(attachment_id: int, range_header: Optional[str] = Header(None, alias="Range")):
+    """
+    Stream the full body of an attachment, honouring HTTP Range requests.
+    
+    Only the requested bytes are sliced out in the database, chunk by chunk, so
+    memory use grows with the range rather than with the document.
+    
+    Args:
+        attachment_id: ID of the attachment
+        range_header: Optional ``Range: bytes=start-end`` header
+        
+    Returns:
+        Streaming text response (206 for a satisfiable range)
+    """
+    try:
+        # octet_length reads the stored size without decompressing the body
+        query = f"""
+            SELECT a.file_name, octet_length(c.content) AS total
+            FROM {settings.db_schema}.attachment_contents c
+            JOIN {settings.db_schema}.attachments a ON a.id = c.attachment_id
+            WHERE c.attachment_id = %s
+        """
+        row = await run_in_threadpool(execute_query, query, (attachment_id,), False)
+    except Exception as e:
+        logger.error(f"Failed to load attachment content: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to load attachment content: {str(e)}")
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    
+    total = row["total"]
+    byte_range = _parse_range(range_header, total) if range_header and total else None
+    start, end = byte_range if byte_range else (0, total - 1)
+    chunk_query = f"""
+        SELECT substring(convert_to(content, 'UTF8') FROM %s FOR %s) AS chunk
+        FROM {settings.db_schema}.attachment_contents
+        WHERE attachment_id = %s
+    """
+    
+    def iter_body():
+        for offset in range(start, end + 1, CONTENT_CHUNK_SIZE):
+            length = min(CONTENT_CHUNK_SIZE, end + 1 - offset)
+            # substring() offsets are 1-based
+            chunk = execute_query(chunk_query, (offset + 1, length, attachment_id), fetch_all=False)
+            if not chunk or not chunk["chunk"]:
+                # Deleted while streaming
+                return
+            yield bytes(chunk["chunk"])
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1 if total else 0),
+        "Content-Disposition": _content_disposition(row["file_name"])
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    
+    return StreamingResponse(
+        iter_body(),
+        status_code=206 if byte_range else 200,
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
+
+
+def _remove_terms(content: str) -> None:
+    """Discount a deleted document's suggestion terms (best effort)"""
+    try:
+        remove_document_terms(content)
+    except Exception as e:
+        logger.warning(f"Failed to remove suggestion terms: {e}")
+
+
 @router.delete("/attachments/{attachment_id}")
-async def delete_attachment(attachment_id: int):
+async def delete_attachment(attachment_id: int, background_tasks: BackgroundTasks):
     """
     Delete an attachment by ID.
     
@@ -276,15 +781,27 @@ async def delete_attachment(attachment_id: int):
         JSON response with deletion status
     """
     try:
+        # Return the body being deleted so its suggestion terms can be discounted
         query = f"""
-            DELETE FROM {settings.db_schema}.attachments
-            WHERE id = %s
+            WITH body AS (
+                SELECT content FROM {settings.db_schema}.attachment_contents
+                WHERE attachment_id = %s
+            ), deleted AS (
+                DELETE FROM {settings.db_schema}.attachments
+                WHERE id = %s
+                RETURNING id
+            )
+            SELECT deleted.id, body.content
+            FROM deleted LEFT JOIN body ON TRUE
         """
-        rows_affected = execute_query(query, (attachment_id,))
+        deleted = execute_query(query, (attachment_id, attachment_id), fetch_all=False)
         
-        if rows_affected == 0:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Attachment not found")
         
+        if deleted['content']:
+            background_tasks.add_task(_remove_terms, deleted['content'])
+        
         return JSONResponse(
             content={
                 "message": f"Attachment {attachment_id} deleted successfully"
@@ -5,7 +5,6 @@ Only includes schemas for attachment/document management.
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Optional
-from uuid import UUID
 
 
 # Attachment Schemas
@@ -38,25 +37,49 @@ class AttachmentDetail(AttachmentResponse):
 
 
 # Search Schemas
+class SearchScores(BaseModel):
+    """Per-result relevance scores"""
+    keyword: float
+    semantic: float
+    hybrid: float
+
+
+class SearchResultMetadata(BaseModel):
+    """Per-result file metadata"""
+    filename: str
+    content_length: int
+
+
 class SearchResult(BaseModel):
-    """Schema for individual search result"""
-    id: int
-    title: str  # file_name
-    snippet: str  # truncated content
-    metadata: dict  # includes filename, content_length, uploaded_at
-    scores: dict  # keyword_score, semantic_score, hybrid_score
+    """Schema for individual search result (any field may be omitted via ``fields``)"""
+    id: Optional[str] = None
+    title: Optional[str] = None  # file_name
+    snippet: Optional[str] = None  # truncated content
+    scores: Optional[SearchScores] = None
+    metadata: Optional[SearchResultMetadata] = None
 
 
 class SearchResponse(BaseModel):
     """Schema for search API response"""
     query: str
     mode: str  # keyword, semantic, or hybrid
+    effective_mode: str  # mode actually used (keyword when degraded)
+    degraded: bool
     results: list[SearchResult]
-    count: int
-    author_id: UUID
-    is_published: bool
-    created_at: datetime
-    updated_at: datetime
-    
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    total_results: int
+
+
+# Listing Schemas
+class AttachmentListItem(BaseModel):
+    """Schema for an attachment in the listing"""
+    id: str
+    filename: str
+    uploaded_at: Optional[datetime] = None
+    content_length: int
+    linked_filenames: list[str] = []
+
+
+class AttachmentListResponse(BaseModel):
+    """Schema for attachment listing response"""
+    attachments: list[AttachmentListItem]
+    total: int
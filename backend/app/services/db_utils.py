@@ -3,10 +3,40 @@ Database connection utilities for direct database access
 Used for hybrid search operations that require raw SQL
 """
 
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
 from app.config import settings
-from typing import Any, Dict, Optional, Union, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Union, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_db_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+
+def _get_dsn() -> str:
+    """Convert DATABASE_URL into a libpq connection string"""
+    # Parse the DATABASE_URL to get connection parameters
+    db_url = settings.database_url
+    
+    # Handle different URL formats
+    if db_url.startswith("postgresql+asyncpg://"):
+        db_url = db_url.replace("postgresql+asyncpg://", "postgresql://")
+    return db_url
 
 
 def get_db_connection():
@@ -17,20 +47,441 @@ def get_db_connection():
     Returns:
         psycopg2 connection object
     """
-    # Parse the DATABASE_URL to get connection parameters
-    db_url = settings.database_url
-    
-    # Handle different URL formats
-    if db_url.startswith("postgresql+asyncpg://"):
-        db_url = db_url.replace("postgresql+asyncpg://", "postgresql://")
-    
     try:
-        conn = psycopg2.connect(db_url)
+        conn = psycopg2.connect(_get_dsn())
         return conn
     except Exception as e:
         raise Exception(f"Failed to connect to database: {str(e)}")
 
 
+def init_db_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """
+    Create the shared connection pool (once per process) and open its minimum connections.
+    
+    Returns:
+        The process-wide connection pool
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            try:
+                _db_pool = psycopg2.pool.ThreadedConnectionPool(
+                    settings.db_pool_min_size,
+                    settings.db_pool_max_size,
+                    _get_dsn()
+                )
+            except Exception as e:
+                raise Exception(f"Failed to connect to database: {str(e)}")
+        return _db_pool
+
+
+def close_db_pool() -> None:
+    """Close every pooled connection"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Current usage of the shared pool without touching the database.
+    
+    Returns:
+        Borrowed, idle and maximum connection counts plus utilization (0-1)
+    """
+    pool = _db_pool
+    if pool is None:
+        return {"in_use": 0, "idle": 0, "max": settings.db_pool_max_size, "utilization": 0.0}
+    in_use = len(pool._used)
+    return {
+        "in_use": in_use,
+        "idle": len(pool._pool),
+        "max": pool.maxconn,
+        "utilization": round(in_use / pool.maxconn, 3) if pool.maxconn else 0.0
+    }
+
+
+# Tags (e.g. search mode) attached to statements profiled in the current request
+_query_tags: ContextVar[Dict[str, Any]] = ContextVar("query_tags", default={})
+
+# Statements that change data are never re-run under EXPLAIN ANALYZE
+_WRITE_STATEMENT = re.compile(r"\b(INSERT|UPDATE|DELETE|TRUNCATE|ALTER|CREATE|DROP)\b", re.IGNORECASE)
+
+
+@contextmanager
+def query_tags(**tags: Any) -> Iterator[None]:
+    """
+    Tag statements executed inside the block in the slow-query log.
+    
+    Args:
+        **tags: Values recorded with each captured statement, e.g. mode="hybrid"
+    """
+    token = _query_tags.set({**_query_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _query_tags.reset(token)
+
+
+def _summarize_plan(node: Dict[str, Any], scans: List[Dict[str, Any]]) -> None:
+    """Collect the scan nodes of a JSON plan so index usage is visible at a glance"""
+    if "Relation Name" in node:
+        scans.append({
+            "node": node.get("Node Type"),
+            "relation": node.get("Relation Name"),
+            "index": node.get("Index Name"),
+            "actual_rows": node.get("Actual Rows"),
+            "actual_total_ms": node.get("Actual Total Time"),
+        })
+    for child in node.get("Plans", []):
+        _summarize_plan(child, scans)
+
+
+class QueryProfiler:
+    """
+    Opt-in per-statement timing with EXPLAIN capture, shared by every worker.
+    
+    Every statement run through execute_query/execute_insert is timed and
+    aggregated by its text; each worker adds its totals to
+    ``slow_query_statements`` every ``flush_seconds``. Read statements slower
+    than the threshold, or a sampled fraction of all reads, are re-run in the
+    background under ``EXPLAIN (ANALYZE, BUFFERS)`` and stored in
+    ``slow_query_captures``, which keeps the newest ``log_size`` plans.
+    
+    Captures add database load, so each statement is captured at most once per
+    ``cooldown_seconds`` across the deployment and at most ``max_pending``
+    captures are queued per worker; the rest are counted as skipped.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool,
+        threshold_ms: float,
+        sample_rate: float,
+        log_size: int,
+        cooldown_seconds: float = 60.0,
+        max_pending: int = 4,
+        flush_seconds: float = 10.0,
+    ):
+        self.enabled = enabled
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.log_size = log_size
+        self.cooldown_seconds = cooldown_seconds
+        self.max_pending = max_pending
+        self.flush_seconds = flush_seconds
+        # Totals since the last flush; the database holds the deployment-wide sums
+        self._deltas: Dict[str, Dict[str, float]] = {}
+        self._last_flush = time.monotonic()
+        self._flush_pending = False
+        self._pending: set = set()
+        self._last_captured: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Flushes and captures share one thread so profiling never holds more than one extra connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+    
+    def _delta(self, statement: str) -> Dict[str, float]:
+        """Unflushed totals for a statement; call with the lock held"""
+        return self._deltas.setdefault(
+            statement, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "skipped": 0}
+        )
+    
+    def record(self, query: str, params: Optional[Tuple], duration_ms: float) -> None:
+        """Record one statement execution and schedule a plan capture if warranted"""
+        statement = " ".join(query.split())
+        now = time.monotonic()
+        with self._lock:
+            stats = self._delta(statement)
+            stats["calls"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            flush = not self._flush_pending and now - self._last_flush >= self.flush_seconds
+            if flush:
+                self._flush_pending = True
+        if flush:
+            self._executor.submit(self.flush)
+        
+        if _WRITE_STATEMENT.search(query):
+            return
+        if duration_ms >= self.threshold_ms:
+            reason = "slow"
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return
+        
+        with self._lock:
+            if (
+                statement in self._pending
+                or len(self._pending) >= self.max_pending
+                or now - self._last_captured.get(statement, float("-inf")) < self.cooldown_seconds
+            ):
+                self._delta(statement)["skipped"] += 1
+                return
+            self._pending.add(statement)
+            self._last_captured[statement] = now
+        self._executor.submit(self._capture, statement, query, params, duration_ms, reason, dict(_query_tags.get()))
+    
+    def flush(self) -> None:
+        """Add this worker's statement totals to the shared table"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            self._last_flush = time.monotonic()
+            self._flush_pending = False
+        if not deltas:
+            return
+        # Sorted so concurrent flushes from several workers lock rows in the same order
+        rows = sorted(
+            (
+                _statement_hash(statement),
+                statement,
+                int(values["calls"]),
+                values["total_ms"],
+                values["max_ms"],
+                int(values["skipped"]),
+            )
+            for statement, values in deltas.items()
+        )
+        try:
+            self._write(
+                f"""
+                INSERT INTO {settings.db_schema}.slow_query_statements AS s
+                    (statement_hash, statement, calls, total_ms, max_ms, skipped_captures)
+                VALUES %s
+                ON CONFLICT (statement_hash) DO UPDATE SET
+                    calls = s.calls + EXCLUDED.calls,
+                    total_ms = s.total_ms + EXCLUDED.total_ms,
+                    max_ms = GREATEST(s.max_ms, EXCLUDED.max_ms),
+                    skipped_captures = s.skipped_captures + EXCLUDED.skipped_captures
+                """,
+                rows
+            )
+        except Exception as e:
+            logger.warning(f"Failed to flush statement timings: {e}")
+    
+    def _capture(
+        self,
+        statement: str,
+        query: str,
+        params: Optional[Tuple],
+        duration_ms: float,
+        reason: str,
+        tags: Dict[str, Any],
+    ) -> None:
+        try:
+            self._explain(statement, query, params, duration_ms, reason, tags)
+        finally:
+            with self._lock:
+                self._pending.discard(statement)
+    
+    def _explain(
+        self,
+        statement: str,
+        query: str,
+        params: Optional[Tuple],
+        duration_ms: float,
+        reason: str,
+        tags: Dict[str, Any],
+    ) -> None:
+        schema = settings.db_schema
+        statement_hash = _statement_hash(statement)
+        try:
+            with pooled_connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        # Another worker may have captured this statement within the cooldown
+                        cur.execute(
+                            f"""
+                            SELECT 1 FROM {schema}.slow_query_captures
+                            WHERE statement_hash = %s
+                              AND captured_at > LOCALTIMESTAMP - make_interval(secs => %s)
+                            LIMIT 1
+                            """,
+                            (statement_hash, self.cooldown_seconds)
+                        )
+                        recently_captured = cur.fetchone() is not None
+                        if not recently_captured:
+                            cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+                            plan = cur.fetchone()[0][0]
+                            cur.execute(
+                                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                                (f"{schema}.attachments",)
+                            )
+                            row = cur.fetchone()
+                finally:
+                    # EXPLAIN ANALYZE executes the statement; never keep its effects
+                    if not conn.closed:
+                        conn.rollback()
+        except Exception as e:
+            logger.warning(f"Failed to capture query plan: {e}")
+            return
+        
+        if recently_captured:
+            with self._lock:
+                self._delta(statement)["skipped"] += 1
+            return
+        
+        scans: List[Dict[str, Any]] = []
+        _summarize_plan(plan["Plan"], scans)
+        try:
+            self._write(
+                f"""
+                INSERT INTO {schema}.slow_query_captures
+                    (worker_pid, reason, duration_ms, explain_execution_ms, statement_hash,
+                     statement, params, tags, scans, plan)
+                VALUES %s
+                """,
+                [(
+                    os.getpid(),
+                    reason,
+                    round(duration_ms, 2),
+                    plan.get("Execution Time"),
+                    statement_hash,
+                    statement,
+                    # Embedding vectors make params huge; keep enough to identify the call
+                    psycopg2.extras.Json([repr(param)[:120] for param in (params or ())]),
+                    psycopg2.extras.Json({**tags, "corpus_size": row[0] if row else None}, dumps=_dumps),
+                    psycopg2.extras.Json(scans),
+                    psycopg2.extras.Json(plan),
+                )],
+                # Keep only the newest log_size captures across the deployment
+                f"""
+                DELETE FROM {schema}.slow_query_captures
+                WHERE id <= (
+                    SELECT id FROM {schema}.slow_query_captures
+                    ORDER BY id DESC
+                    OFFSET %s LIMIT 1
+                )
+                """,
+                (self.log_size,)
+            )
+        except Exception as e:
+            logger.warning(f"Failed to store query plan: {e}")
+    
+    def _write(self, query: str, rows: List[Tuple], *cleanup: Any) -> None:
+        """
+        Run a batched insert (plus an optional follow-up statement) in one transaction.
+        
+        Uses the cursor directly so the profiler's own statements are never profiled.
+        """
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    psycopg2.extras.execute_values(cur, query, rows)
+                    if cleanup:
+                        cur.execute(*cleanup)
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+    
+    def _read(self, query: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+                conn.commit()
+                return rows
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+    
+    def recent_captures(self, limit: int, include_plans: bool = False) -> List[Dict[str, Any]]:
+        """Newest captured plans from every worker"""
+        plan_column = ", plan" if include_plans else ""
+        return self._read(
+            f"""
+            SELECT captured_at, worker_pid, reason, duration_ms, explain_execution_ms,
+                   tags, statement, params, scans{plan_column}
+            FROM {settings.db_schema}.slow_query_captures
+            ORDER BY id DESC
+            LIMIT %s
+            """,
+            (limit,)
+        )
+    
+    def statement_stats(self) -> List[Dict[str, Any]]:
+        """Aggregated timings per statement across the deployment, slowest total first"""
+        return self._read(
+            f"""
+            SELECT statement,
+                   calls,
+                   round(total_ms::numeric, 2)::float8 AS total_ms,
+                   round((total_ms / NULLIF(calls, 0))::numeric, 2)::float8 AS mean_ms,
+                   round(max_ms::numeric, 2)::float8 AS max_ms,
+                   skipped_captures
+            FROM {settings.db_schema}.slow_query_statements
+            ORDER BY total_ms DESC
+            """
+        )
+    
+    def reset(self) -> None:
+        """Clear the shared log and statistics, and this worker's unflushed totals"""
+        with self._lock:
+            self._deltas.clear()
+            self._last_captured.clear()
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f"DELETE FROM {settings.db_schema}.slow_query_captures")
+                    cur.execute(f"DELETE FROM {settings.db_schema}.slow_query_statements")
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+
+
+def _statement_hash(statement: str) -> str:
+    return hashlib.md5(statement.encode("utf-8")).hexdigest()
+
+
+def _dumps(value: Any) -> str:
+    # Tags are caller-supplied; fall back to str() for anything JSON cannot encode
+    return json.dumps(value, default=str)
+
+
+query_profiler = QueryProfiler(
+    enabled=settings.query_profiling_enabled,
+    threshold_ms=settings.slow_query_threshold_ms,
+    sample_rate=settings.slow_query_sample_rate,
+    log_size=settings.slow_query_log_size,
+    cooldown_seconds=settings.slow_query_capture_cooldown_seconds,
+    max_pending=settings.slow_query_max_pending_captures,
+    flush_seconds=settings.slow_query_flush_seconds,
+)
+
+
+def _execute_timed(cur, query: str, params: Optional[Tuple]) -> None:
+    """Execute a statement, timing it when profiling is enabled"""
+    if not query_profiler.enabled:
+        cur.execute(query, params)
+        return
+    started = time.perf_counter()
+    cur.execute(query, params)
+    query_profiler.record(query, params, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def pooled_connection() -> Iterator[Any]:
+    """
+    Borrow a connection from the shared pool, returning it when done.
+    
+    Broken connections are discarded instead of being handed out again.
+    """
+    pool = _db_pool or init_db_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+
 def execute_query(query: str, params: Optional[Tuple] = None, fetch_all: bool = True) -> Any:
     """
     Execute a query and return results.
@@ -43,24 +494,26 @@ def execute_query(query: str, params: Optional[Tuple] = None, fetch_all: bool =
     Returns:
         Query results as list of dicts or single dict
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, params)
-            
-            if query.strip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
-                conn.commit()
-                return cur.rowcount
-            
-            if fetch_all:
-                return cur.fetchall()
-            else:
-                return cur.fetchone()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                _execute_timed(cur, query, params)
+                
+                if query.strip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+                    conn.commit()
+                    return cur.rowcount
+                
+                if fetch_all:
+                    result = cur.fetchall()
+                else:
+                    result = cur.fetchone()
+            # End the read transaction so the pooled connection is not left idle in transaction
+            conn.commit()
+            return result
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            raise e
 
 
 def execute_insert(query: str, params: Optional[Tuple] = None) -> Optional[int]:
@@ -74,20 +527,19 @@ def execute_insert(query: str, params: Optional[Tuple] = None) -> Optional[int]:
     Returns:
         ID of the inserted row
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(query, params)
-            # Get the ID of the inserted row
-            if "RETURNING" in query.upper():
-                result = cur.fetchone()
-                conn.commit()
-                return result[0] if result else None
-            else:
-                conn.commit()
-                return cur.lastrowid
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
\ No newline at end of file
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                _execute_timed(cur, query, params)
+                # Get the ID of the inserted row
+                if "RETURNING" in query.upper():
+                    result = cur.fetchone()
+                    conn.commit()
+                    return result[0] if result else None
+                else:
+                    conn.commit()
+                    return cur.lastrowid
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            raise e
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Content-hash deduplication for document ingest
+Identical uploads are resolved to the existing attachment instead of being
+embedded and indexed again.
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.services.db_utils import get_db_connection, execute_query
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEDUP_POLICIES = ("link", "reuse")
+
+
+def compute_content_hash(content: str) -> str:
+    """
+    Compute the SHA-256 hex digest used as the attachment content key.
+
+    Args:
+        content: Decoded text content of the file
+
+    Returns:
+        64 character hex digest
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def get_dedup_policy() -> str:
+    """Return the configured dedup policy, falling back to 'link' if unknown"""
+    policy = (settings.dedup_policy or "").strip().lower()
+    if policy not in DEDUP_POLICIES:
+        logger.warning(f"Unknown DEDUP_POLICY '{settings.dedup_policy}', using 'link'")
+        return "link"
+    return policy
+
+
+def find_by_content_hash(content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up an existing attachment by content hash.
+
+    Args:
+        content_hash: SHA-256 hex digest of the content
+
+    Returns:
+        Row with id, file_name and content_length, or None
+    """
+    query = f"""
+        SELECT id, file_name, content_length
+        FROM {settings.db_schema}.attachments
+        WHERE content_hash = %s
+    """
+    return execute_query(query, (content_hash,), fetch_all=False)
+
+
+def find_by_content_hashes(content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up existing attachments for several content hashes in one query.
+
+    Args:
+        content_hashes: SHA-256 hex digests of the contents
+
+    Returns:
+        Rows with id, file_name and content_length, keyed by content hash
+    """
+    if not content_hashes:
+        return {}
+    # Cast to the column type so the unique index is used
+    query = f"""
+        SELECT content_hash, id, file_name, content_length
+        FROM {settings.db_schema}.attachments
+        WHERE content_hash = ANY(%s::char(64)[])
+    """
+    return {row["content_hash"]: row for row in execute_query(query, (list(content_hashes),))}
+
+
+def link_file_name(attachment_id: int, file_name: str) -> None:
+    """
+    Record an additional file name for existing content.
+
+    Args:
+        attachment_id: ID of the attachment holding the content
+        file_name: File name of the duplicate upload
+    """
+    query = f"""
+        INSERT INTO {settings.db_schema}.attachment_file_names (attachment_id, file_name)
+        VALUES (%s, %s)
+        ON CONFLICT (attachment_id, file_name) DO NOTHING
+    """
+    execute_query(query, (attachment_id, file_name))
+
+
+def resolve_duplicate(existing: Dict[str, Any], file_name: str) -> Dict[str, Any]:
+    """
+    Apply the configured dedup policy to an upload whose content already exists.
+
+    Args:
+        existing: Existing attachment row from find_by_content_hash
+        file_name: File name of the new upload
+
+    Returns:
+        Dict describing the deduplicated upload
+    """
+    policy = get_dedup_policy()
+    if policy == "link" and file_name != existing["file_name"]:
+        link_file_name(existing["id"], file_name)
+
+    return {
+        "file_id": existing["id"],
+        "filename": file_name,
+        "existing_filename": existing["file_name"],
+        "content_length": existing["content_length"],
+        "deduplicated": True,
+        "dedup_policy": policy,
+    }
+
+
+def backfill_content_hashes(batch_size: int = 500) -> Dict[str, int]:
+    """
+    One-off backfill that hashes existing attachments and merges duplicates.
+
+    Adds the content_hash column and file name table if missing, hashes every
+    row without a hash, keeps the lowest id for each hash (moving the other
+    file names onto it) and finally creates the unique index.
+
+    Args:
+        batch_size: Number of rows hashed per round trip
+
+    Returns:
+        Counts of hashed and removed rows
+    """
+    schema = settings.db_schema
+    hashed = 0
+    removed = 0
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                ALTER TABLE {schema}.attachments
+                ADD COLUMN IF NOT EXISTS content_hash CHAR(64)
+            """)
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {schema}.attachment_file_names (
+                    id SERIAL PRIMARY KEY,
+                    attachment_id INTEGER NOT NULL
+                        REFERENCES {schema}.attachments (id) ON DELETE CASCADE,
+                    file_name VARCHAR(500) NOT NULL,
+                    linked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (attachment_id, file_name)
+                )
+            """)
+            conn.commit()
+
+            while True:
+                cur.execute(f"""
+                    SELECT a.id, c.content
+                    FROM {schema}.attachments a
+                    JOIN {schema}.attachment_contents c ON c.attachment_id = a.id
+                    WHERE a.content_hash IS NULL
+                    ORDER BY a.id
+                    LIMIT %s
+                """, (batch_size,))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for row_id, content in rows:
+                    cur.execute(
+                        f"UPDATE {schema}.attachments SET content_hash = %s WHERE id = %s",
+                        (compute_content_hash(content), row_id)
+                    )
+                conn.commit()
+                hashed += len(rows)
+
+            # Keep the oldest row per hash and move the other names onto it
+            cur.execute(f"""
+                WITH ranked AS (
+                    SELECT id, file_name,
+                        MIN(id) OVER (PARTITION BY content_hash) AS keep_id
+                    FROM {schema}.attachments
+                )
+                INSERT INTO {schema}.attachment_file_names (attachment_id, file_name)
+                SELECT r.keep_id, r.file_name
+                FROM ranked r
+                JOIN {schema}.attachments k ON k.id = r.keep_id
+                WHERE r.id <> r.keep_id AND r.file_name <> k.file_name
+                ON CONFLICT (attachment_id, file_name) DO NOTHING
+            """)
+            cur.execute(f"""
+                DELETE FROM {schema}.attachments a
+                USING {schema}.attachments k
+                WHERE a.content_hash = k.content_hash AND a.id > k.id
+            """)
+            removed = cur.rowcount
+            cur.execute(f"""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_attachments_content_hash
+                    ON {schema}.attachments (content_hash)
+            """)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+    return {"hashed": hashed, "removed": removed}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    counts = backfill_content_hashes()
+    logger.info(f"Backfill complete: {counts['hashed']} rows hashed, {counts['removed']} duplicates removed")
@@ -0,0 +1,392 @@
+"""
+Embedding Gateway
+Admission control, deadlines, retries and circuit breaking around the
+embedding provider so provider brownouts cannot stall request handling.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anyio
+import anyio.to_thread
+from openai import APIConnectionError
+
+from app.services.db_utils import execute_query
+from app.services.embeddings import EmbeddingsService, embeddings_service
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingUnavailableError(Exception):
+    """Raised when an embedding cannot be produced within the gateway's limits"""
+
+
+class EmbeddingModelChangedError(Exception):
+    """Raised when vectors from a model that is no longer active would be stored"""
+
+
+def is_retryable_error(error: Optional[BaseException]) -> bool:
+    """
+    Check an embedding error and its cause chain for transient failures.
+
+    429 and 5xx responses, connection errors and timeouts are retryable.
+    """
+    while error is not None:
+        if isinstance(error, APIConnectionError):
+            return True
+        status_code = getattr(error, "status_code", None)
+        if status_code == 429 or (status_code is not None and status_code >= 500):
+            return True
+        if "rate limit" in str(error).lower():
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def get_active_model(conn=None) -> Optional[Tuple[str, int]]:
+    """
+    Return the model and dimension of the most recently swapped-in re-embedding job.
+
+    The embedding column holds vectors from that model, so it takes precedence
+    over EMBEDDING_MODEL/EMBEDDING_DIMENSION once a migration has completed.
+
+    Args:
+        conn: Connection to query on, inside its current transaction (default: pooled)
+
+    Returns:
+        (model, dimension), or None if no migration has been swapped in
+    """
+    query = f"""
+        SELECT model, dimension
+        FROM {settings.db_schema}.reembed_checkpoints
+        WHERE status = 'swapped'
+        ORDER BY updated_at DESC
+        LIMIT 1
+    """
+    if conn is not None:
+        with conn.cursor() as cur:
+            cur.execute(query)
+            row = cur.fetchone()
+        return (row[0], row[1]) if row else None
+    row = execute_query(query, fetch_all=False)
+    return (row["model"], row["dimension"]) if row else None
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Opens after ``failure_threshold`` consecutive failures, rejects calls for
+    ``reset_seconds`` and then lets a single trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return whether a call may be attempted now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial without judging provider health"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Embedding circuit breaker opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class EmbeddingGateway:
+    """
+    Bounded-concurrency front door to the embedding provider.
+
+    At most ``max_concurrency`` provider calls run at once and at most
+    ``max_queue`` callers wait for a slot; anything beyond that, anything that
+    cannot finish before its deadline and anything arriving while the breaker
+    is open fails fast with EmbeddingUnavailableError.
+
+    Admission, queueing and backoff happen on the event loop. Only admitted
+    provider calls take a thread, from a limiter of their own, so a brownout
+    cannot exhaust the threadpool shared with the rest of the app.
+    """
+
+    def __init__(
+        self,
+        service: EmbeddingsService,
+        max_concurrency: int,
+        max_queue: int,
+        deadline_seconds: float,
+        max_retries: int,
+        breaker: CircuitBreaker,
+        model_refresh_seconds: float = 5.0,
+    ):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.breaker = breaker
+        # Event-loop primitives, created on first use in the serving loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._counters = {"requests": 0, "rejected": 0, "retries": 0, "failures": 0}
+        self._latency_ewma_ms: Optional[float] = None
+        self._last_latency_ms: Optional[float] = None
+        self._last_latency_at: Optional[float] = None
+        self.model_refresh_seconds = model_refresh_seconds
+        self._model_checked_at: Optional[float] = None
+        self._model_lock = threading.Lock()
+
+    async def embed_text(self, text: str, deadline_seconds: Optional[float] = None) -> List[float]:
+        """Embed a single text through the gateway"""
+        return await self._call(lambda service, timeout: service.embed_text(text, timeout=timeout), deadline_seconds)
+
+    async def embed_texts(self, texts: List[str], deadline_seconds: Optional[float] = None) -> List[List[float]]:
+        """Embed multiple texts in one provider request through the gateway"""
+        return await self._call(lambda service, timeout: service.embed_texts(texts, timeout=timeout), deadline_seconds)
+
+    async def embed_documents(
+        self, texts: List[str], deadline_seconds: Optional[float] = None
+    ) -> Tuple[List[List[float]], Tuple[str, int]]:
+        """
+        Embed texts for storage, also returning the (model, dimension) that produced them.
+
+        Uploads pass the model on to the insert, which refuses vectors from a model
+        the re-embedding job has since swapped out.
+        """
+        return await self._call(
+            lambda service, timeout: (
+                service.embed_texts(texts, timeout=timeout),
+                (service.model, service.embedding_dimension),
+            ),
+            deadline_seconds,
+        )
+
+    def expire_model(self) -> None:
+        """Make the next call re-read the active model before embedding"""
+        self._model_checked_at = None
+
+    def refresh_model(self, force: bool = False) -> None:
+        """
+        Switch to the model swapped in by the re-embedding job, if it changed.
+
+        Checks the database at most every ``model_refresh_seconds`` unless forced,
+        so a completed migration is picked up without restarting the worker.
+        """
+        now = time.monotonic()
+        checked_at = self._model_checked_at
+        if not force and checked_at is not None and now - checked_at < self.model_refresh_seconds:
+            return
+        if not self._model_lock.acquire(blocking=force):
+            # Another thread is already checking
+            return
+        try:
+            self._model_checked_at = now
+            try:
+                active = get_active_model()
+            except Exception as e:
+                # Database problems surface through health checks; keep the current model
+                logger.debug(f"Failed to read the active embedding model: {e}")
+                return
+            current = self.service
+            if active is None or active == (current.model, current.embedding_dimension):
+                return
+            model, dimension = active
+            service = EmbeddingsService(model=model, embedding_dimension=dimension)
+            service._client = current._client
+            self.service = service
+            logger.info(f"Embedding model switched to {model} ({dimension} dimensions)")
+        finally:
+            self._model_lock.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth, concurrency and breaker state"""
+        with self._lock:
+            snapshot = {
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "latency_ewma_ms": round(self._latency_ewma_ms, 2) if self._latency_ewma_ms is not None else None,
+                "last_latency_ms": round(self._last_latency_ms, 2) if self._last_latency_ms is not None else None,
+                "latency_age_seconds": (
+                    round(time.monotonic() - self._last_latency_at, 1) if self._last_latency_at is not None else None
+                ),
+                "model": self.service.model,
+                "dimension": self.service.embedding_dimension,
+                **self._counters,
+            }
+        snapshot["breaker_state"] = self.breaker.state
+        return snapshot
+
+    def _reject(self, reason: str) -> EmbeddingUnavailableError:
+        with self._lock:
+            self._counters["rejected"] += 1
+        return EmbeddingUnavailableError(reason)
+
+    def _primitives(self) -> Tuple[asyncio.Semaphore, anyio.CapacityLimiter]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._limiter = anyio.CapacityLimiter(self.max_concurrency)
+        return self._slots, self._limiter
+
+    async def _ensure_model(self) -> None:
+        """Refresh the model off the event loop, waiting only when it was expired"""
+        checked_at = self._model_checked_at
+        if checked_at is not None and time.monotonic() - checked_at < self.model_refresh_seconds:
+            return
+        # The loop's default executor, not the shared request threadpool
+        refresh = asyncio.get_running_loop().run_in_executor(None, self.refresh_model, checked_at is None)
+        if checked_at is None:
+            await refresh
+
+    async def _call(self, fn: Callable[[EmbeddingsService, float], Any], deadline_seconds: Optional[float]) -> Any:
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        slots, limiter = self._primitives()
+        await self._ensure_model()
+        # Every attempt of this call uses the same model, even if a refresh swaps it
+        service = self.service
+
+        with self._lock:
+            self._counters["requests"] += 1
+        if not slots.locked():
+            # A free slot is taken without suspending
+            await slots.acquire()
+        else:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._counters["rejected"] += 1
+                    raise EmbeddingUnavailableError("Embedding queue is full")
+                self._waiting += 1
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise self._reject("Timed out waiting for an embedding slot")
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return await self._call_with_retries(lambda timeout: fn(service, timeout), deadline, limiter)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            slots.release()
+
+    async def _call_with_retries(
+        self, fn: Callable[[float], Any], deadline: float, limiter: anyio.CapacityLimiter
+    ) -> Any:
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._reject("Embedding deadline exceeded")
+
+            if not self.breaker.allow_request():
+                raise self._reject("Embedding provider circuit breaker is open")
+
+            started = time.perf_counter()
+            try:
+                result = await anyio.to_thread.run_sync(fn, remaining, limiter=limiter)
+            except Exception as e:
+                self._record_latency(time.perf_counter() - started)
+                if not is_retryable_error(e):
+                    # Caller errors (bad input, auth) say nothing about provider health
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_failure()
+                with self._lock:
+                    self._counters["failures"] += 1
+
+                delay = min(0.25 * 2 ** attempt, 4.0) * random.uniform(0.5, 1.5)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    raise EmbeddingUnavailableError(f"Embedding provider unavailable: {e}") from e
+                attempt += 1
+                with self._lock:
+                    self._counters["retries"] += 1
+                logger.warning(f"Embedding call failed, retrying in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+
+            self._record_latency(time.perf_counter() - started)
+            self.breaker.record_success()
+            return result
+
+    def _record_latency(self, seconds: float) -> None:
+        """Track provider latency as an exponentially weighted moving average"""
+        latency_ms = seconds * 1000
+        with self._lock:
+            if self._latency_ewma_ms is None:
+                self._latency_ewma_ms = latency_ms
+            else:
+                self._latency_ewma_ms = 0.8 * self._latency_ewma_ms + 0.2 * latency_ms
+            self._last_latency_ms = latency_ms
+            self._last_latency_at = time.monotonic()
+
+
+# Create a global instance
+embedding_gateway = EmbeddingGateway(
+    service=embeddings_service,
+    max_concurrency=settings.embedding_max_concurrency,
+    max_queue=settings.embedding_max_queue,
+    deadline_seconds=settings.embedding_deadline_seconds,
+    max_retries=settings.embedding_max_retries,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.embedding_breaker_threshold,
+        reset_seconds=settings.embedding_breaker_reset_seconds,
+    ),
+    model_refresh_seconds=settings.embedding_model_refresh_seconds,
+)
@@ -1,19 +1,19 @@
 """
 OpenAI Embeddings Service
-Provides text embedding functionality using OpenAI's text-embedding-3-small model
+Provides text embedding functionality using OpenAI's text-embedding-3 models
 """
 
 from openai import OpenAI
 import os
-from typing import List
+from typing import Any, Dict, List, Optional
 from app.config import settings
 
 
 class EmbeddingsService:
-    def __init__(self):
+    def __init__(self, model: Optional[str] = None, embedding_dimension: Optional[int] = None):
         self._client = None
-        self.model = "text-embedding-3-small"
-        self.embedding_dimension = 1536
+        self.model = model or settings.embedding_model
+        self.embedding_dimension = embedding_dimension or settings.embedding_dimension
     
     @property
     def client(self):
@@ -27,15 +27,27 @@ class EmbeddingsService:
                     "OpenAI API key not set. Please set OPENAI_API_KEY environment variable "
                     "or update your .env file with a valid OpenAI API key."
                 )
-            self._client = OpenAI(api_key=api_key)
+            # Retries are handled by the embedding gateway and re-embedding job
+            self._client = OpenAI(api_key=api_key, max_retries=0)
         return self._client
 
-    def embed_text(self, text: str) -> List[float]:
+    def _create_kwargs(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Model and request arguments for the embeddings API"""
+        kwargs: Dict[str, Any] = {"model": self.model}
+        # text-embedding-3 models can be shortened to the configured dimension
+        if self.model.startswith("text-embedding-3"):
+            kwargs["dimensions"] = self.embedding_dimension
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    def embed_text(self, text: str, timeout: Optional[float] = None) -> List[float]:
         """
         Generate embeddings for a single text string.
         
         Args:
             text: The text to embed
+            timeout: Optional request timeout in seconds
             
         Returns:
             List of floats representing the embedding vector
@@ -45,19 +57,20 @@ class EmbeddingsService:
         
         try:
             response = self.client.embeddings.create(
-                model=self.model,
-                input=text.strip()
+                input=text.strip(),
+                **self._create_kwargs(timeout)
             )
             return response.data[0].embedding
         except Exception as e:
             raise Exception(f"Failed to generate embedding: {str(e)}")
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
         """
         Generate embeddings for multiple text strings.
         
         Args:
             texts: List of texts to embed
+            timeout: Optional request timeout in seconds
             
         Returns:
             List of embedding vectors
@@ -73,8 +86,8 @@ class EmbeddingsService:
         
         try:
             response = self.client.embeddings.create(
-                model=self.model,
-                input=valid_texts
+                input=valid_texts,
+                **self._create_kwargs(timeout)
             )
             return [item.embedding for item in response.data]
         except Exception as e:
@@ -0,0 +1,179 @@
+"""
+Health Monitor
+Periodically probes the database, required extensions and indexes, and the
+embedding provider, caching the results so health checks and load-shedding
+decisions never touch a dependency on the request path.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from psycopg2.pool import PoolError
+from starlette.concurrency import run_in_threadpool
+
+from app.services.db_utils import get_pool_stats, pooled_connection
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_EXTENSIONS = ("vector", "pgroonga")
+REQUIRED_INDEXES = (
+    "idx_attachments_embedding_hnsw",
+    "idx_attachment_contents_content_pgroonga",
+)
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNHEALTHY = "unhealthy"
+STARTING = "starting"
+
+
+def _probe_database() -> Dict[str, Any]:
+    """Measure a database round trip and check extensions and search indexes"""
+    started = time.perf_counter()
+    try:
+        with pooled_connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                    round_trip_ms = (time.perf_counter() - started) * 1000
+
+                    cur.execute(
+                        "SELECT extname FROM pg_extension WHERE extname = ANY(%s)",
+                        (list(REQUIRED_EXTENSIONS),)
+                    )
+                    installed = {row[0] for row in cur.fetchall()}
+
+                    indexes = {}
+                    for index in REQUIRED_INDEXES:
+                        cur.execute("SELECT to_regclass(%s)", (f"{settings.db_schema}.{index}",))
+                        indexes[index] = cur.fetchone()[0] is not None
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+    except PoolError:
+        # Every pooled connection is busy; the database itself may be fine
+        return {"ok": False, "error": "connection pool exhausted", "pool_exhausted": True}
+    except Exception as e:
+        # Driver errors name hosts and roles; /health is public, so only the log gets them
+        logger.warning(f"Database health probe failed: {e}")
+        return {"ok": False, "error": "database unreachable"}
+
+    return {
+        "ok": True,
+        "round_trip_ms": round(round_trip_ms, 2),
+        "extensions": {name: name in installed for name in REQUIRED_EXTENSIONS},
+        "indexes": indexes,
+    }
+
+
+def _probe_embeddings() -> Dict[str, Any]:
+    """Summarize provider latency observed by the gateway (no extra provider calls)"""
+    from app.services.embedding_gateway import embedding_gateway
+
+    metrics = embedding_gateway.metrics()
+    return {
+        "breaker_state": metrics["breaker_state"],
+        "latency_ewma_ms": metrics["latency_ewma_ms"],
+        "latency_age_seconds": metrics["latency_age_seconds"],
+        "queue_depth": metrics["queue_depth"],
+        "in_flight": metrics["in_flight"],
+    }
+
+
+class HealthMonitor:
+    """
+    Background prober holding the latest dependency health snapshot.
+
+    ``snapshot`` and the load-shedding helpers only read cached state plus the
+    in-process pool counters, so they are O(1) and safe to call per request.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._snapshot: Dict[str, Any] = {"status": STARTING, "checked_at": None}
+
+    @property
+    def snapshot(self) -> Dict[str, Any]:
+        return self._snapshot
+
+    def probe(self) -> Dict[str, Any]:
+        """Run all probes once and replace the cached snapshot"""
+        database = _probe_database()
+        embeddings = _probe_embeddings()
+        pool = get_pool_stats()
+
+        problems = []
+        status = HEALTHY
+        if not database["ok"]:
+            status = DEGRADED if database.get("pool_exhausted") else UNHEALTHY
+            problems.append(f"database: {database['error']}")
+        else:
+            missing = [name for name, present in database["extensions"].items() if not present]
+            missing += [name for name, present in database["indexes"].items() if not present]
+            if missing:
+                status = UNHEALTHY
+                problems.append(f"missing: {', '.join(missing)}")
+            elif database["round_trip_ms"] > settings.health_db_latency_threshold_ms:
+                status = DEGRADED
+                problems.append("database latency above threshold")
+
+        if self._embeddings_overloaded(embeddings):
+            if status == HEALTHY:
+                status = DEGRADED
+            problems.append("embedding provider slow or unavailable")
+        if pool["utilization"] >= settings.health_shed_pool_utilization:
+            if status == HEALTHY:
+                status = DEGRADED
+            problems.append("database pool nearly exhausted")
+
+        self._snapshot = {
+            "status": status,
+            "checked_at": time.time(),
+            "problems": problems,
+            "database": database,
+            "pool": pool,
+            "embeddings": embeddings,
+        }
+        return self._snapshot
+
+    async def run(self) -> None:
+        """Probe forever at the configured interval"""
+        while True:
+            try:
+                await run_in_threadpool(self.probe)
+            except Exception as e:
+                logger.error(f"Health probe failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    @staticmethod
+    def _embeddings_overloaded(embeddings: Dict[str, Any]) -> bool:
+        # Half-open means the reset timeout passed and the next call is a trial,
+        # so an idle worker recovers without waiting for traffic
+        if embeddings["breaker_state"] == "open":
+            return True
+        # The average only moves with traffic; stop trusting it once it goes stale
+        age = embeddings["latency_age_seconds"]
+        if age is None or age > settings.health_embedding_latency_max_age_seconds:
+            return False
+        return embeddings["latency_ewma_ms"] > settings.health_embedding_latency_threshold_ms
+
+    def shed_reason(self) -> Optional[str]:
+        """
+        Reason to reject database-backed work right now, or None to accept it.
+
+        Uses the cached database status and the live pool utilization.
+        """
+        if self._snapshot["status"] == UNHEALTHY and not self._snapshot["database"]["ok"]:
+            return "Database unavailable"
+        if get_pool_stats()["utilization"] >= settings.health_shed_pool_utilization:
+            return "Database connection pool exhausted"
+        return None
+
+
+# Create a global instance
+health_monitor = HealthMonitor(interval_seconds=settings.health_probe_interval_seconds)
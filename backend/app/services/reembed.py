@@ -0,0 +1,389 @@
+"""
+Re-embedding and backfill job
+Walks the attachments table in id order and regenerates embeddings, either to
+repair rows without an embedding or to migrate every row to a new embedding
+model/dimension through a shadow column that is swapped in atomically.
+
+Usage:
+    python -m app.services.reembed --repair
+    python -m app.services.reembed --model text-embedding-3-large --dimension 1024
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2.errors
+import psycopg2.extras
+
+from app.services.db_utils import get_db_connection
+from app.services.embeddings import EmbeddingsService
+from app.services.embedding_gateway import get_active_model, is_retryable_error
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SHADOW_COLUMN = "embedding_next"
+SHADOW_INDEX = "idx_attachments_embedding_next_hnsw"
+LIVE_INDEX = "idx_attachments_embedding_hnsw"
+# pgvector HNSW indexes on the vector type support at most 2000 dimensions
+MAX_HNSW_DIMENSION = 2000
+MAX_RETRIES = 6
+# Swap attempts, each after catching up rows uploaded meanwhile or a lock timeout
+MAX_SWAP_ATTEMPTS = 10
+
+
+class RequestThrottle:
+    """
+    Shared pacing for embedding requests across worker threads.
+
+    Requests are spaced evenly to stay under the per-minute budget, and a
+    rate-limit response pushes the next allowed request further out for
+    every worker.
+    """
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / max(requests_per_minute, 1)
+        self._next_allowed = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the caller may send the next request"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed)
+            self._next_allowed = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def back_off(self, delay: float) -> None:
+        """Delay all workers after a rate-limit response"""
+        with self._lock:
+            self._next_allowed = max(self._next_allowed, time.monotonic() + delay)
+
+
+class ReembedJob:
+    """
+    Resumable re-embedding job.
+
+    In repair mode rows with ``embedding IS NULL`` are embedded in place with the
+    current model. In migration mode every row is embedded into the shadow column
+    with the target model, progress is checkpointed in ``reembed_checkpoints``,
+    the shadow HNSW index is built and the columns are swapped in one transaction.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        dimension: Optional[int] = None,
+        repair: bool = False,
+        batch_size: Optional[int] = None,
+        workers: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+    ):
+        self.repair = repair
+        self.schema = settings.db_schema
+        if repair and model is None and dimension is None:
+            # Repaired rows must match the vectors already in the embedding column
+            model, dimension = get_active_model() or (None, None)
+        self.embeddings = EmbeddingsService(model=model, embedding_dimension=dimension)
+        self.batch_size = batch_size or settings.reembed_batch_size
+        self.workers = workers or settings.reembed_workers
+        self.throttle = RequestThrottle(requests_per_minute or settings.reembed_requests_per_minute)
+        self.target_column = "embedding" if repair else SHADOW_COLUMN
+        self.job_name = f"{self.embeddings.model}:{self.embeddings.embedding_dimension}"
+
+        if not repair and self.embeddings.embedding_dimension > MAX_HNSW_DIMENSION:
+            raise ValueError(
+                f"HNSW indexes support at most {MAX_HNSW_DIMENSION} dimensions, "
+                f"got {self.embeddings.embedding_dimension}"
+            )
+
+    def run(self) -> Dict[str, int]:
+        """
+        Run the job to completion, resuming from the last checkpoint.
+
+        Returns:
+            Counts of embedded and skipped rows
+        """
+        conn = get_db_connection()
+        try:
+            if self.repair:
+                last_id = 0
+            else:
+                last_id = self._prepare_migration(conn)
+                if last_id is None:
+                    logger.info(f"Re-embedding job {self.job_name} is already the active model")
+                    return {"embedded": 0, "skipped": 0}
+
+            counts = self._backfill(conn, last_id)
+
+            if not self.repair:
+                # Rows uploaded while the backfill ran still need the new model
+                counts["embedded"] += self._backfill(conn, 0, only_missing=True)["embedded"]
+                self._set_status(conn, "backfilled")
+                self._build_shadow_index(conn)
+                for _ in range(MAX_SWAP_ATTEMPTS):
+                    if self._swap(conn):
+                        break
+                    # The shadow index picks up these rows as they are written
+                    counts["embedded"] += self._backfill(conn, 0, only_missing=True)["embedded"]
+                else:
+                    raise RuntimeError(
+                        f"Could not swap in after {MAX_SWAP_ATTEMPTS} attempts; rerun the job to finish"
+                    )
+            return counts
+        finally:
+            conn.close()
+
+    def _prepare_migration(self, conn) -> Optional[int]:
+        """Create the checkpoint row and shadow column; return the id to resume after"""
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.schema}.reembed_checkpoints (
+                    job_name VARCHAR(200) PRIMARY KEY,
+                    model VARCHAR(100) NOT NULL,
+                    dimension INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL DEFAULT 0,
+                    status VARCHAR(20) NOT NULL DEFAULT 'running',
+                    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute(
+                f"SELECT last_id, status FROM {self.schema}.reembed_checkpoints WHERE job_name = %s",
+                (self.job_name,)
+            )
+            row = cur.fetchone()
+            target = (self.embeddings.model, self.embeddings.embedding_dimension)
+            if row and row[1] == "swapped":
+                if get_active_model(conn) == target:
+                    conn.commit()
+                    return None
+                # Swapped in once, but another migration has replaced it since
+                logger.info(f"Re-embedding job {self.job_name} was swapped out since; running it again")
+                cur.execute(f"""
+                    UPDATE {self.schema}.reembed_checkpoints
+                    SET last_id = 0, status = 'running', updated_at = CURRENT_TIMESTAMP
+                    WHERE job_name = %s
+                """, (self.job_name,))
+            elif row is None:
+                cur.execute(
+                    f"INSERT INTO {self.schema}.reembed_checkpoints (job_name, model, dimension) VALUES (%s, %s, %s)",
+                    (self.job_name, *target)
+                )
+
+            if row is None or row[1] == "swapped":
+                # A fresh run: discard any shadow column left by another target
+                cur.execute(f"ALTER TABLE {self.schema}.attachments DROP COLUMN IF EXISTS {SHADOW_COLUMN}")
+                last_id = 0
+            else:
+                last_id = row[0]
+                logger.info(f"Resuming re-embedding job {self.job_name} after id {last_id}")
+
+            cur.execute(f"""
+                ALTER TABLE {self.schema}.attachments
+                ADD COLUMN IF NOT EXISTS {SHADOW_COLUMN} vector({self.embeddings.embedding_dimension})
+            """)
+        conn.commit()
+        return last_id
+
+    def _fetch_window(self, conn, last_id: int, only_missing: bool) -> List[Tuple[int, str]]:
+        """Fetch the next rows after last_id for one round of concurrent batches"""
+        missing = f"AND a.{self.target_column} IS NULL" if (self.repair or only_missing) else ""
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT a.id, c.content
+                FROM {self.schema}.attachments a
+                JOIN {self.schema}.attachment_contents c ON c.attachment_id = a.id
+                WHERE a.id > %s {missing}
+                ORDER BY a.id
+                LIMIT %s
+            """, (last_id, self.batch_size * self.workers))
+            rows = cur.fetchall()
+        conn.commit()
+        return rows
+
+    def _embed_batch(self, rows: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Embed one batch with throttling and jittered exponential backoff"""
+        for attempt in range(MAX_RETRIES):
+            self.throttle.wait()
+            try:
+                vectors = self.embeddings.embed_texts([content for _, content in rows])
+                return [(row_id, json.dumps(vector)) for (row_id, _), vector in zip(rows, vectors)]
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == MAX_RETRIES - 1:
+                    raise
+                delay = min(2 ** attempt, 60) + random.uniform(0, 1)
+                logger.warning(f"Embedding batch throttled, retrying in {delay:.1f}s: {e}")
+                self.throttle.back_off(delay)
+        return []
+
+    def _backfill(self, conn, last_id: int, only_missing: bool = False) -> Dict[str, int]:
+        """Embed rows window by window, checkpointing after each window"""
+        embedded = 0
+        skipped = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                window = self._fetch_window(conn, last_id, only_missing)
+                if not window:
+                    break
+
+                valid = [(row_id, content) for row_id, content in window if content and content.strip()]
+                skipped += len(window) - len(valid)
+                batches = [valid[i:i + self.batch_size] for i in range(0, len(valid), self.batch_size)]
+
+                for values in executor.map(self._embed_batch, batches):
+                    self._write_embeddings(conn, values)
+                    embedded += len(values)
+
+                last_id = window[-1][0]
+                if not (self.repair or only_missing):
+                    self._checkpoint(conn, last_id)
+                logger.info(f"Re-embedded through id {last_id} ({embedded} rows)")
+
+        return {"embedded": embedded, "skipped": skipped}
+
+    def _write_embeddings(self, conn, values: List[Tuple[int, str]]) -> None:
+        """Write one batch of embeddings into the target column"""
+        if not values:
+            return
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                f"""
+                    UPDATE {self.schema}.attachments AS a
+                    SET {self.target_column} = v.embedding::vector
+                    FROM (VALUES %s) AS v(id, embedding)
+                    WHERE a.id = v.id
+                """,
+                values
+            )
+        conn.commit()
+
+    def _checkpoint(self, conn, last_id: int) -> None:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {self.schema}.reembed_checkpoints
+                SET last_id = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE job_name = %s
+            """, (last_id, self.job_name))
+        conn.commit()
+
+    def _set_status(self, conn, status: str) -> None:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {self.schema}.reembed_checkpoints
+                SET status = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE job_name = %s
+            """, (status, self.job_name))
+        conn.commit()
+
+    def _build_shadow_index(self, conn) -> None:
+        """Build the shadow HNSW index without blocking writes, reusing a valid one"""
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                (f"{self.schema}.{SHADOW_INDEX}",)
+            )
+            row = cur.fetchone()
+        conn.commit()
+        if row and row[0]:
+            # A valid index already covers every write to the shadow column
+            logger.info(f"Reusing shadow index {SHADOW_INDEX}")
+            self._set_status(conn, "indexed")
+            return
+
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                # A crashed CONCURRENTLY build leaves an invalid index behind
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {self.schema}.{SHADOW_INDEX}")
+                cur.execute(f"""
+                    CREATE INDEX CONCURRENTLY {SHADOW_INDEX}
+                        ON {self.schema}.attachments
+                        USING hnsw ({SHADOW_COLUMN} vector_cosine_ops)
+                """)
+        finally:
+            conn.autocommit = False
+        self._set_status(conn, "indexed")
+
+    def _swap(self, conn) -> bool:
+        """
+        Swap the shadow column and index in place of the live ones atomically.
+
+        The table lock waits at most REEMBED_SWAP_LOCK_TIMEOUT_MS, so long-running
+        searches make the swap back off instead of queueing all traffic behind it.
+
+        Returns:
+            False, without swapping, if the lock timed out or rows still lack a
+            shadow embedding
+        """
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL lock_timeout = %s", (f"{settings.reembed_swap_lock_timeout_ms}ms",))
+            try:
+                cur.execute(f"LOCK TABLE {self.schema}.attachments IN ACCESS EXCLUSIVE MODE")
+            except psycopg2.errors.LockNotAvailable:
+                conn.rollback()
+                delay = random.uniform(0.5, 1.5)
+                logger.info(f"Timed out waiting for the swap lock; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                return False
+            cur.execute(f"""
+                SELECT COUNT(*)
+                FROM {self.schema}.attachments a
+                JOIN {self.schema}.attachment_contents c ON c.attachment_id = a.id
+                WHERE a.{SHADOW_COLUMN} IS NULL AND length(btrim(c.content)) > 0
+            """)
+            remaining = cur.fetchone()[0]
+            if remaining:
+                conn.rollback()
+                logger.info(f"{remaining} rows were added before the swap; catching up")
+                return False
+
+            cur.execute(f"ALTER TABLE {self.schema}.attachments DROP COLUMN embedding")
+            cur.execute(f"ALTER TABLE {self.schema}.attachments RENAME COLUMN {SHADOW_COLUMN} TO embedding")
+            cur.execute(f"ALTER INDEX {self.schema}.{SHADOW_INDEX} RENAME TO {LIVE_INDEX}")
+            cur.execute(f"""
+                UPDATE {self.schema}.reembed_checkpoints
+                SET status = 'swapped', updated_at = CURRENT_TIMESTAMP
+                WHERE job_name = %s
+            """, (self.job_name,))
+        conn.commit()
+        logger.info(
+            f"Swapped in {self.job_name}; API workers pick up the new model within "
+            f"{settings.embedding_model_refresh_seconds:g}s"
+        )
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-embed attachments")
+    parser.add_argument("--model", help="Target embedding model (default: EMBEDDING_MODEL)")
+    parser.add_argument("--dimension", type=int, help="Target dimension (default: EMBEDDING_DIMENSION)")
+    parser.add_argument("--repair", action="store_true", help="Only embed rows with a NULL embedding")
+    parser.add_argument("--batch-size", type=int, help="Texts per embedding request")
+    parser.add_argument("--workers", type=int, help="Concurrent embedding requests")
+    parser.add_argument("--rpm", type=int, help="Embedding requests per minute")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    job = ReembedJob(
+        model=args.model,
+        dimension=args.dimension,
+        repair=args.repair,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        requests_per_minute=args.rpm,
+    )
+    counts = job.run()
+    logger.info(f"Re-embedding complete: {counts['embedded']} embedded, {counts['skipped']} skipped")
+
+
+if __name__ == "__main__":
+    main()
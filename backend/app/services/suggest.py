@@ -0,0 +1,207 @@
+"""
+Type-ahead suggestions
+Maintains a table of terms extracted from uploaded documents and serves prefix
+completions over it and over file names from PGroonga prefix indexes, with an
+in-memory cache for hot prefixes. No embedding call is involved.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import psycopg2.extras
+
+from app.services.db_utils import execute_query, get_db_connection, pooled_connection
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r"[^\W\d_][\w'-]{2,39}", re.UNICODE)
+# Most frequent terms kept per document, so one large file cannot flood the table
+MAX_TERMS_PER_DOCUMENT = 300
+STOPWORDS = frozenset(
+    "the and for are but not you all any can her was one our out has have had his how its may "
+    "new now old see two who did get him let say she too use that with this from they will "
+    "would there their what about which when make like than them then these into more some "
+    "only other such also been were each your over most".split()
+)
+
+
+def extract_terms(content: str) -> List[str]:
+    """
+    Extract the distinct, lowercased suggestion terms of a document.
+
+    Args:
+        content: Text content of the document
+
+    Returns:
+        Up to MAX_TERMS_PER_DOCUMENT terms, most frequent first
+    """
+    counts = Counter(
+        term for term in (match.group(0).strip("'-").lower() for match in TERM_PATTERN.finditer(content))
+        if len(term) >= 3 and term not in STOPWORDS
+    )
+    return [term for term, _ in counts.most_common(MAX_TERMS_PER_DOCUMENT)]
+
+
+def _adjust_term_counts(terms: List[str], delta: int) -> None:
+    """Add delta to the document count of each term, dropping terms that reach zero"""
+    if not terms:
+        return
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                # Sorted so concurrent uploads lock rows in the same order
+                psycopg2.extras.execute_values(
+                    cur,
+                    f"""
+                        INSERT INTO {settings.db_schema}.suggest_terms (term, doc_count)
+                        VALUES %s
+                        ON CONFLICT (term) DO UPDATE
+                        SET doc_count = {settings.db_schema}.suggest_terms.doc_count + EXCLUDED.doc_count
+                    """,
+                    [(term, delta) for term in sorted(terms)]
+                )
+                if delta < 0:
+                    # Only the adjusted terms can have reached zero; doc_count is not indexed
+                    cur.execute(
+                        f"DELETE FROM {settings.db_schema}.suggest_terms WHERE term = ANY(%s) AND doc_count <= 0",
+                        (list(terms),)
+                    )
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+
+
+def add_document_terms(content: str) -> None:
+    """Count the terms of a newly stored document"""
+    _adjust_term_counts(extract_terms(content), 1)
+
+
+def remove_document_terms(content: str) -> None:
+    """Discount the terms of a deleted document"""
+    _adjust_term_counts(extract_terms(content), -1)
+
+
+class PrefixCache:
+    """Small thread-safe LRU cache with a time-to-live for hot prefixes"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Tuple[str, int], value: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+prefix_cache = PrefixCache(settings.suggest_cache_size, settings.suggest_cache_ttl_seconds)
+
+
+def suggest(query: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Complete a partial query from file names and document terms.
+
+    File names are matched on the whole query; terms are matched on its last word.
+
+    Args:
+        query: Partial query typed so far
+        limit: Maximum number of suggestions
+
+    Returns:
+        Suggestions with text, type ('title' or 'term') and doc_count
+    """
+    normalized = " ".join(query.lower().split())
+    if not normalized:
+        return []
+
+    key = (normalized, limit)
+    cached = prefix_cache.get(key)
+    if cached is not None:
+        return cached
+
+    term_prefix = normalized.rsplit(" ", 1)[-1]
+    sql = f"""
+        (
+            SELECT file_name AS text, 'title' AS type, 1 AS doc_count
+            FROM {settings.db_schema}.attachments
+            WHERE file_name &^ %s
+            ORDER BY uploaded_at DESC
+            LIMIT %s
+        )
+        UNION ALL
+        (
+            SELECT term AS text, 'term' AS type, doc_count
+            FROM {settings.db_schema}.suggest_terms
+            WHERE term &^ %s
+            ORDER BY doc_count DESC, term
+            LIMIT %s
+        )
+    """
+    rows = execute_query(sql, (normalized, limit, term_prefix, limit))
+
+    # Titles first, then terms, up to the limit
+    suggestions = [dict(row) for row in rows][:limit]
+    prefix_cache.set(key, suggestions)
+    return suggestions
+
+
+def rebuild_terms() -> int:
+    """
+    Rebuild the term table from every stored document.
+
+    Returns:
+        Number of distinct terms
+    """
+    counts: Counter = Counter()
+    conn = get_db_connection()
+    try:
+        with conn.cursor(name="suggest_rebuild") as cur:
+            cur.itersize = 200
+            cur.execute(f"SELECT content FROM {settings.db_schema}.attachment_contents")
+            for (content,) in cur:
+                counts.update(extract_terms(content))
+        conn.commit()
+
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {settings.db_schema}.suggest_terms")
+            psycopg2.extras.execute_values(
+                cur,
+                f"INSERT INTO {settings.db_schema}.suggest_terms (term, doc_count) VALUES %s",
+                list(counts.items()),
+                page_size=1000
+            )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+    return len(counts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Rebuilt suggestion terms: {rebuild_terms()} distinct terms")
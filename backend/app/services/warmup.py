@@ -0,0 +1,141 @@
+"""
+Per-worker warm-up
+Opens the database pool, initializes the embeddings client and optionally
+pre-warms the search indexes before the worker reports itself ready.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List
+
+from app.services.db_utils import init_db_pool, pooled_connection
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Relations loaded into shared buffers by pg_prewarm
+PREWARM_RELATIONS = [
+    "idx_attachments_embedding_hnsw",
+    "idx_attachment_contents_content_pgroonga",
+    "attachments",
+]
+
+
+class WarmupState:
+    """Readiness of this worker process"""
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.steps: Dict[str, Any] = {}
+        self.last_error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "steps": self.steps,
+            "last_error": self.last_error,
+        }
+
+
+warmup_state = WarmupState()
+
+
+def _open_db_pool() -> Dict[str, Any]:
+    """Open the pool's minimum connections and check each with a round trip"""
+    pool = init_db_pool()
+    connections = []
+    try:
+        for _ in range(settings.db_pool_min_size):
+            conn = pool.getconn()
+            connections.append(conn)
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.commit()
+    finally:
+        for conn in connections:
+            pool.putconn(conn, close=bool(conn.closed))
+    return {"connections": len(connections)}
+
+
+def _init_embeddings_client() -> Dict[str, Any]:
+    """Create the OpenAI client so the first request doesn't pay for it"""
+    from app.services.embedding_gateway import embedding_gateway
+
+    # Embed with the model a completed re-embedding job swapped in, not just the env default
+    embedding_gateway.refresh_model(force=True)
+    try:
+        embedding_gateway.service.client
+    except ValueError as e:
+        # A missing API key only disables semantic search; keyword search still works
+        logger.warning(f"Embeddings client not initialized: {e}")
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "model": embedding_gateway.service.model,
+        "dimension": embedding_gateway.service.embedding_dimension,
+    }
+
+
+def _prewarm_indexes() -> Dict[str, Any]:
+    """Load the HNSW and PGroonga indexes into shared buffers"""
+    loaded: Dict[str, int] = {}
+    skipped: List[str] = []
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                for relation in PREWARM_RELATIONS:
+                    cur.execute("SELECT to_regclass(%s)", (f"{settings.db_schema}.{relation}",))
+                    if cur.fetchone()[0] is None:
+                        skipped.append(relation)
+                        continue
+                    cur.execute("SELECT pg_prewarm(%s::regclass)", (f"{settings.db_schema}.{relation}",))
+                    loaded[relation] = cur.fetchone()[0]
+                # PGroonga keeps its lexicon in Groonga files; a probe query opens them
+                cur.execute(
+                    f"SELECT 1 FROM {settings.db_schema}.attachment_contents WHERE content &@~ %s LIMIT 1",
+                    ("warmup",)
+                )
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+    return {"blocks": loaded, "skipped": skipped}
+
+
+def warm_up() -> bool:
+    """
+    Run the warm-up steps once, recording timings on warmup_state.
+
+    The worker becomes ready once the database pool is open; embeddings client and
+    index pre-warming problems are logged but do not hold readiness back.
+
+    Returns:
+        Whether the worker is ready
+    """
+    warmup_state.attempts += 1
+    warmup_state.last_error = None
+    steps = [("db_pool", _open_db_pool, True), ("embeddings_client", _init_embeddings_client, True)]
+    if settings.warmup_prewarm_indexes:
+        steps.append(("prewarm_indexes", _prewarm_indexes, False))
+
+    for name, step, required in steps:
+        if warmup_state.steps.get(name, {}).get("ok"):
+            continue
+        started = time.perf_counter()
+        try:
+            result = step()
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            warmup_state.steps[name] = {"ok": True, "duration_ms": duration_ms, **result}
+        except Exception as e:
+            # /ready is public; details stay in the worker log
+            warmup_state.steps[name] = {"ok": False, "error": "failed, see worker log"}
+            warmup_state.last_error = f"{name} failed"
+            logger.error(f"Warm-up step {name} failed: {e}")
+            if required:
+                return False
+
+    warmup_state.ready = True
+    return True
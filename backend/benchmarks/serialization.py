@@ -0,0 +1,124 @@
+"""
+Search result serialization benchmark
+Compares the previous dict-building loop rendered through the default
+JSONResponse with format_search_results validated and serialized by the
+/search route's SearchResponse model (as FastAPI does it), reporting the cost
+per result. No database or embedding provider is needed.
+
+Usage (from backend/):
+    python -m benchmarks.serialization
+"""
+
+import random
+import time
+from decimal import Decimal
+from typing import Callable, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.routers.hybrid_search import PREVIEW_LENGTH, format_search_results, router
+
+RESULT_COUNTS = (10, 100, 1000)
+ROUNDS = 200
+
+# The response model field FastAPI validates and serializes /search responses with
+SEARCH_ROUTE = next(
+    route for route in router.routes
+    if isinstance(route, APIRoute) and route.path == f"{router.prefix}/search"
+)
+
+
+def _legacy_rows(count: int) -> List[dict]:
+    """Rows shaped like the old query: full content and numeric/NULL scores"""
+    return [
+        {
+            "id": i,
+            "file_name": f"document-{i}.txt",
+            "content": "lorem ipsum dolor sit amet " * random.randint(5, 400),
+            "keyword_score": Decimal("0.0") if i % 3 else random.random(),
+            "semantic_score": random.random(),
+            "hybrid_score": random.random(),
+        }
+        for i in range(count)
+    ]
+
+
+def _typed_rows(legacy: List[dict]) -> List[dict]:
+    """The same rows as the current query returns them (SQL-side snippet and float8 scores)"""
+    return [
+        {
+            "id": str(row["id"]),
+            "file_name": row["file_name"],
+            "snippet": row["content"][:PREVIEW_LENGTH] + ("..." if len(row["content"]) > PREVIEW_LENGTH else ""),
+            "content_length": len(row["content"]),
+            "keyword_score": float(row["keyword_score"]),
+            "semantic_score": row["semantic_score"],
+            "hybrid_score": row["hybrid_score"],
+        }
+        for row in legacy
+    ]
+
+
+def legacy_render(rows: List[dict]) -> bytes:
+    formatted_results = []
+    for row in rows:
+        snippet = row['content'][:200] + "..." if len(row['content']) > 200 else row['content']
+        formatted_results.append({
+            "id": str(row['id']),
+            "title": row['file_name'],
+            "snippet": snippet,
+            "scores": {
+                "keyword": float(row['keyword_score']) if row['keyword_score'] else 0.0,
+                "semantic": float(row['semantic_score']) if row['semantic_score'] else 0.0,
+                "hybrid": float(row['hybrid_score']) if row['hybrid_score'] else 0.0
+            },
+            "metadata": {
+                "filename": row['file_name'],
+                "content_length": len(row['content'])
+            }
+        })
+    return JSONResponse(content={"results": formatted_results, "total_results": len(formatted_results)}).body
+
+
+def current_render(rows: List[dict], fields=None) -> bytes:
+    results = format_search_results(rows, fields) if fields else format_search_results(rows)
+    content = {
+        "query": "lorem",
+        "mode": "hybrid",
+        "effective_mode": "hybrid",
+        "degraded": False,
+        "results": results,
+        "total_results": len(results)
+    }
+    # Same steps as fastapi.routing.serialize_response for the route
+    field = SEARCH_ROUTE.response_field
+    value, errors = field.validate(content, {}, loc=("response",))
+    assert not errors, errors
+    return field.serialize_json(value, exclude_unset=SEARCH_ROUTE.response_model_exclude_unset)
+
+
+def _per_result_us(render: Callable[[], bytes], count: int) -> float:
+    render()  # warm up
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        render()
+    return (time.perf_counter() - started) / ROUNDS / count * 1e6
+
+
+def main() -> None:
+    random.seed(42)
+    print(f"{'results':>8} {'legacy us/result':>18} {'model us/result':>18} {'ids+scores us/result':>22}")
+    for count in RESULT_COUNTS:
+        legacy = _legacy_rows(count)
+        typed = _typed_rows(legacy)
+        print(
+            f"{count:>8} "
+            f"{_per_result_us(lambda: legacy_render(legacy), count):>18.2f} "
+            f"{_per_result_us(lambda: current_render(typed), count):>18.2f} "
+            f"{_per_result_us(lambda: current_render(typed, ('id', 'scores')), count):>22.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for production
+Runs the FastAPI app in uvicorn workers, one per available CPU by default,
+and recycles workers gracefully after a bounded number of requests.
+"""
+
+import os
+
+
+def _cpu_count() -> int:
+    """CPUs available to this process (respects container CPU affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Async workers keep a CPU busy on their own, so default to one per CPU
+workers = int(os.getenv("WEB_CONCURRENCY", max(_cpu_count(), 1)))
+
+# Recycle workers after a jittered number of requests so they don't all restart at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+# Time for in-flight requests to finish when a worker is recycled or on shutdown
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Each worker imports the app itself so its lifespan warm-up runs in that process
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
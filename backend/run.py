@@ -1,10 +1,16 @@
+import os
+import sys
 import uvicorn
 from app.main import app
 
 if __name__ == "__main__":
+    if "--prod" in sys.argv:
+        # Production: multiple uvicorn workers under gunicorn (see gunicorn.conf.py)
+        os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"])
+
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True
-    )
\ No newline at end of file
+    )
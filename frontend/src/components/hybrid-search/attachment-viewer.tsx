@@ -123,6 +123,11 @@ export function AttachmentViewer({ open, onClose }: AttachmentViewerProps) {
                           <p className="text-xs text-gray-500">
                             {new Date(attachment.created_at).toLocaleDateString()}
                           </p>
+                          {attachment.linked_filenames && attachment.linked_filenames.length > 0 && (
+                            <p className="text-xs text-gray-500 truncate">
+                              Also uploaded as {attachment.linked_filenames.join(', ')}
+                            </p>
+                          )}
                         </div>
                       </div>
                     </div>
@@ -8,7 +8,7 @@ import { Card, CardContent } from '@/components/ui/card'
 import { Input } from '@/components/ui/input'
 import { Badge } from '@/components/ui/badge'
 import { cn } from '@/lib/utils'
-import { useSearch } from '@/hooks/useHybridSearch'
+import { useSearch, useSuggest } from '@/hooks/useHybridSearch'
 import { useAuth } from '@/contexts/AuthContext'
 import { FileUpload } from './file-upload'
 import { AttachmentViewer } from './attachment-viewer'
@@ -38,6 +38,7 @@ export function HybridSearchDashboard() {
   
   // Use real API hooks
   const { search, isSearching, searchError, searchResults } = useSearch()
+  const suggestions = useSuggest(searchQuery)
   const { logout } = useAuth()
 
   const handleLogout = async () => {
@@ -162,8 +163,15 @@ export function HybridSearchDashboard() {
                 onChange={(e) => setSearchQuery(e.target.value)}
                 onKeyPress={handleKeyPress}
                 placeholder="Search for anything..."
+                list="search-suggestions"
+                autoComplete="off"
                 className="flex-1 border-0 text-lg px-4 py-3 bg-transparent focus:outline-none focus-visible:ring-0"
               />
+              <datalist id="search-suggestions">
+                {suggestions.map((suggestion) => (
+                  <option key={suggestion} value={suggestion} />
+                ))}
+              </datalist>
               <Button 
                 onClick={handleSearch} 
                 disabled={isSearching || !searchQuery.trim()}
@@ -2,10 +2,11 @@
  * Hooks for Hybrid Search functionality
  */
 
-import { useState, useCallback } from 'react'
+import { useState, useCallback, useEffect } from 'react'
 import { 
   uploadFile, 
   searchDocuments, 
+  getSuggestions,
   getAttachments, 
   deleteAttachment,
   type ApiSearchResult,
@@ -93,6 +94,42 @@ export function useSearch() {
   }
 }
 
+/**
+ * Debounced type-ahead completions for the current query text.
+ * Uses the lightweight suggest endpoint, never the full search.
+ */
+export function useSuggest(query: string, delayMs: number = 150) {
+  const [suggestions, setSuggestions] = useState<string[]>([])
+
+  useEffect(() => {
+    const trimmed = query.trim()
+    if (!trimmed) {
+      setSuggestions([])
+      return
+    }
+
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      try {
+        const result = await getSuggestions(trimmed, 8, controller.signal)
+        // Terms complete the last word; titles replace the whole query
+        const head = query.slice(0, query.lastIndexOf(' ') + 1)
+        const completions = result.suggestions.map(s => s.type === 'term' ? head + s.text : s.text)
+        setSuggestions(Array.from(new Set(completions)))
+      } catch {
+        // Suggestions are best effort; ignore aborted and failed requests
+      }
+    }, delayMs)
+
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [query, delayMs])
+
+  return suggestions
+}
+
 export function useAttachments() {
   const [attachments, setAttachments] = useState<ApiAttachment[]>([])
   const [isLoading, setIsLoading] = useState(false)
@@ -23,6 +23,7 @@ export interface ApiAttachment {
   filename: string;
   created_at: string;
   content_length: number;
+  linked_filenames?: string[];
 }
 
 export interface UploadResponse {
@@ -39,6 +40,17 @@ export interface SearchResponse {
   total_results: number;
 }
 
+export interface ApiSuggestion {
+  text: string;
+  type: "title" | "term";
+  doc_count: number;
+}
+
+export interface SuggestResponse {
+  query: string;
+  suggestions: ApiSuggestion[];
+}
+
 export interface AttachmentsResponse {
   attachments: ApiAttachment[];
   total: number;
@@ -100,6 +112,34 @@ export async function searchDocuments(
   return response.json();
 }
 
+/**
+ * Get type-ahead suggestions for a partial query (no embedding call)
+ */
+export async function getSuggestions(
+  query: string,
+  limit: number = 8,
+  signal?: AbortSignal
+): Promise<SuggestResponse> {
+  const params = new URLSearchParams({
+    q: query,
+    limit: String(limit),
+  });
+
+  const response = await fetch(`/api/v1/hybrid-search/suggest?${params}`, {
+    credentials: "include", // Send cookies
+    signal,
+  });
+
+  if (!response.ok) {
+    const errorData = await response
+      .json()
+      .catch(() => ({ detail: "Suggest failed" }));
+    throw new ApiError(response.status, errorData.detail || "Suggest failed");
+  }
+
+  return response.json();
+}
+
 /**
  * Get list of uploaded attachments
  */
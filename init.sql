@@ -10,6 +10,7 @@ CREATE DATABASE hybrid_search_db;
 -- Enable required extensions
 CREATE EXTENSION IF NOT EXISTS vector;
 CREATE EXTENSION IF NOT EXISTS pgroonga;
+CREATE EXTENSION IF NOT EXISTS pg_prewarm;  -- optional index warm-up on worker start
 
 -- Create schema
 CREATE SCHEMA IF NOT EXISTS hybrid_search;
@@ -18,20 +19,28 @@ CREATE SCHEMA IF NOT EXISTS hybrid_search;
 DROP TABLE IF EXISTS hybrid_search.attachments CASCADE;
 
 -- Attachments table for uploaded documents with hybrid search support
+-- Holds only small, hot fields; document bodies live in attachment_contents
 CREATE TABLE attachments (
     id SERIAL PRIMARY KEY,
     file_name VARCHAR(500) NOT NULL,
-    content TEXT NOT NULL,
+    content_hash CHAR(64),  -- SHA-256 of content, used to deduplicate uploads
+    preview VARCHAR(200) NOT NULL DEFAULT '',  -- leading characters of content for result snippets
     embedding vector(1536),  -- OpenAI text-embedding-3-small or sentence-transformers dimension
-    content_length INTEGER GENERATED ALWAYS AS (length(content)) STORED,
+    content_length INTEGER NOT NULL DEFAULT 0,
     uploaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Document bodies, LZ4-compressed in TOAST and kept out of the hot table
+CREATE TABLE hybrid_search.attachment_contents (
+    attachment_id INTEGER PRIMARY KEY REFERENCES hybrid_search.attachments (id) ON DELETE CASCADE,
+    content TEXT COMPRESSION lz4 NOT NULL
+);
+
 -- Create indexes for efficient search
 -- PGroonga index for full-text search
-CREATE INDEX idx_attachments_content_pgroonga 
-    ON attachments 
+CREATE INDEX idx_attachment_contents_content_pgroonga 
+    ON hybrid_search.attachment_contents 
     USING pgroonga (content);
 
 -- Vector index for semantic search (HNSW for faster approximate nearest neighbor search)
@@ -47,6 +56,72 @@ CREATE INDEX idx_attachments_file_name
 CREATE INDEX idx_attachments_uploaded_at 
     ON hybrid_search.attachments (uploaded_at DESC);
 
+-- Unique content hash so identical uploads resolve to a single row
+CREATE UNIQUE INDEX idx_attachments_content_hash 
+    ON hybrid_search.attachments (content_hash);
+
+-- Additional file names linked to deduplicated content
+CREATE TABLE hybrid_search.attachment_file_names (
+    id SERIAL PRIMARY KEY,
+    attachment_id INTEGER NOT NULL REFERENCES hybrid_search.attachments (id) ON DELETE CASCADE,
+    file_name VARCHAR(500) NOT NULL,
+    linked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (attachment_id, file_name)
+);
+
+-- Prefix index on file names for type-ahead title suggestions
+CREATE INDEX idx_attachments_file_name_prefix 
+    ON hybrid_search.attachments 
+    USING pgroonga (file_name pgroonga_varchar_term_search_ops_v2);
+
+-- Terms extracted from uploaded documents for type-ahead suggestions
+CREATE TABLE hybrid_search.suggest_terms (
+    term VARCHAR(40) PRIMARY KEY,
+    doc_count INTEGER NOT NULL DEFAULT 0  -- number of documents containing the term
+);
+
+CREATE INDEX idx_suggest_terms_prefix 
+    ON hybrid_search.suggest_terms 
+    USING pgroonga (term pgroonga_varchar_term_search_ops_v2);
+
+-- Progress of re-embedding jobs (model/dimension migrations); the most recently
+-- swapped job names the model the API embeds with
+CREATE TABLE hybrid_search.reembed_checkpoints (
+    job_name VARCHAR(200) PRIMARY KEY,
+    model VARCHAR(100) NOT NULL,
+    dimension INTEGER NOT NULL,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Slow-query log shared by every API worker (see /admin/slow-queries)
+CREATE TABLE hybrid_search.slow_query_captures (
+    id BIGSERIAL PRIMARY KEY,
+    captured_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    worker_pid INTEGER NOT NULL,
+    reason VARCHAR(20) NOT NULL,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    explain_execution_ms DOUBLE PRECISION,
+    statement_hash CHAR(32) NOT NULL,
+    statement TEXT NOT NULL,
+    params JSONB NOT NULL,
+    tags JSONB NOT NULL,
+    scans JSONB NOT NULL,
+    plan JSONB NOT NULL
+);
+CREATE INDEX idx_slow_query_captures_statement
+    ON hybrid_search.slow_query_captures (statement_hash, captured_at);
+
+CREATE TABLE hybrid_search.slow_query_statements (
+    statement_hash CHAR(32) PRIMARY KEY,
+    statement TEXT NOT NULL,
+    calls BIGINT NOT NULL DEFAULT 0,
+    total_ms DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_ms DOUBLE PRECISION NOT NULL DEFAULT 0,
+    skipped_captures BIGINT NOT NULL DEFAULT 0
+);
+
 -- Create the database user
 CREATE USER hybrid_search_user WITH PASSWORD 'hybrid_search_pwd';
 